@@ -1,6 +1,9 @@
 """
 Agents package for Agentic AI Retail System
 """
+import asyncio
+import logging
+
 from agents.base_agent import (
     BaseAgent,
     AgentType,
@@ -8,12 +11,52 @@ from agents.base_agent import (
     AgentResponse,
     AgentRegistry
 )
-from agents.orchestrator import OrchestratorAgent, orchestrator
+from agents.orchestrator import (
+    OrchestratorAgent,
+    orchestrator,
+    new_context_summary,
+    new_conversation_history,
+    history_snapshot,
+    context_summary_line,
+    greeting_text,
+    Turn
+)
 from agents.recommendation_agent import RecommendationAgent, recommendation_agent
 from agents.inventory_agent import InventoryAgent, inventory_agent
 from agents.payment_agent import PaymentAgent, payment_agent
 from agents.voice_agent import VoiceAgent, VoiceSession, VoiceState, get_voice_agent, voice_agent
 
+
+def register_agents():
+    """
+    Register the orchestrator and worker agents (idempotent)
+    
+    Also runs on the first AgentRegistry lookup, so routing works even when
+    bootstrap_agents was never called. Slots that already hold an agent are
+    left alone.
+    """
+    for agent in (orchestrator, recommendation_agent, inventory_agent, payment_agent):
+        if AgentRegistry._agents[agent.agent_type.index] is None:
+            AgentRegistry.register(agent)
+
+
+async def bootstrap_agents():
+    """
+    Register all agents and warm shared resources
+    
+    Call once from application startup (API startup event, console mode)
+    before routing any messages.
+    """
+    register_agents()
+    
+    # Build the product similarity index off the event loop so the first
+    # inventory query doesn't pay for it
+    from services.product_index import product_index
+    try:
+        await asyncio.to_thread(product_index.build)
+    except Exception as e:
+        logging.getLogger(__name__).warning("Product index prewarm failed: %s", e)
+
 __all__ = [
     # Base classes
     "BaseAgent",
@@ -36,5 +79,14 @@ __all__ = [
     "payment_agent",
     "voice_agent",
     # Factories
-    "get_voice_agent"
+    "get_voice_agent",
+    "register_agents",
+    "bootstrap_agents",
+    # Helpers
+    "new_context_summary",
+    "new_conversation_history",
+    "history_snapshot",
+    "Turn",
+    "context_summary_line",
+    "greeting_text"
 ]
@@ -0,0 +1,86 @@
+"""
+Agent Message Bus for Agentic AI Retail System
+In-process pub/sub for inter-agent handoffs (hot path) with asynchronous
+side-channel subscribers such as the audit log (cold path)
+"""
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Dict, List, Set
+
+from config import AGENT_AUDIT_LOG
+
+logger = logging.getLogger(__name__)
+
+Listener = Callable[[str, "AgentMessage"], Awaitable[None]]
+
+
+def inbox_subject(agent_value: str) -> str:
+    """Subject an agent's incoming handoffs are published on"""
+    return f"agents.{agent_value}.inbox"
+
+
+class AgentBus:
+    """
+    Fire-and-forget fan-out of agent messages
+
+    Delivery to the target agent stays a direct await in AgentRegistry;
+    the bus only notifies listeners (audit, analytics, ...) in background
+    tasks, so a slow listener can never add latency to a turn.
+    Subscribe to "*" to receive every subject.
+    """
+
+    def __init__(self):
+        self._listeners: Dict[str, List[Listener]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def subscribe(self, subject: str, listener: Listener):
+        """Register an async listener(subject, message) for a subject (or "*")"""
+        self._listeners.setdefault(subject, []).append(listener)
+
+    def publish(self, subject: str, message) -> None:
+        """Schedule every matching listener without waiting for it"""
+        listeners = self._listeners.get(subject, []) + self._listeners.get("*", [])
+        for listener in listeners:
+            task = asyncio.create_task(self._notify(listener, subject, message))
+            # Keep a reference until done so the task isn't garbage collected
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _notify(listener: Listener, subject: str, message):
+        try:
+            await listener(subject, message)
+        except Exception as e:
+            logger.error("Agent bus listener failed on %s: %s", subject, e)
+
+
+class AgentAuditLog:
+    """Appends one JSON line per handoff (routing metadata only, no payload)"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _write(self, line: str):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    async def __call__(self, subject: str, message):
+        record = message.to_dict()
+        line = json.dumps({
+            "subject": subject,
+            "message_id": record["message_id"],
+            "from_agent": record["from_agent"],
+            "to_agent": record["to_agent"],
+            "intent": record["intent"],
+            "session_id": record["context"].get("session_id"),
+            "timestamp": record["timestamp"]
+        })
+        await asyncio.to_thread(self._write, line)
+
+
+# Global bus instance
+agent_bus = AgentBus()
+
+if AGENT_AUDIT_LOG:
+    agent_bus.subscribe("*", AgentAuditLog(AGENT_AUDIT_LOG))
@@ -2,15 +2,34 @@
 Base Agent class for Agentic AI Retail System
 All specialized agents inherit from this base class
 """
+import itertools
 import logging
+import secrets
 from abc import ABC, abstractmethod
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass, field
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
+from time import time_ns
 
 from services.llm_service import LLMService
 from services.database import DatabaseService
+from agents.agent_bus import agent_bus, inbox_subject
+from config import AGENT_MESSAGE_UUID_IDS
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Internal message IDs: random per-process nonce + monotonic counter
+_PROC_NONCE = secrets.token_hex(4)
+_MESSAGE_COUNTER = itertools.count()
+
+
+def new_message_id() -> str:
+    """Unique ID for an in-process agent message"""
+    if AGENT_MESSAGE_UUID_IDS:
+        return secrets.token_hex(16)
+    return f"{_PROC_NONCE}-{next(_MESSAGE_COUNTER):x}"
 
 
 class AgentType(Enum):
@@ -19,9 +38,13 @@ class AgentType(Enum):
     RECOMMENDATION = "recommendation"
     INVENTORY = "inventory"
     PAYMENT = "payment"
+    
+    def __init__(self, value: str):
+        # Dense position in definition order, used as a registry slot
+        self.index = len(type(self).__members__)
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class AgentMessage:
     """Standard message format for inter-agent communication"""
     message_id: str
@@ -30,7 +53,8 @@ class AgentMessage:
     intent: str
     payload: Dict[str, Any]
     context: Dict[str, Any] = field(default_factory=dict)
-    timestamp: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    # Nanoseconds since the epoch (UTC); formatted only when serialized
+    timestamp: int = field(default_factory=time_ns)
     
     def to_dict(self) -> Dict:
         return {
@@ -40,11 +64,11 @@ class AgentMessage:
             "intent": self.intent,
             "payload": self.payload,
             "context": self.context,
-            "timestamp": self.timestamp
+            "timestamp": (_EPOCH + timedelta(microseconds=self.timestamp // 1000)).isoformat()
         }
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class AgentResponse:
     """Standard response format from agents"""
     success: bool
@@ -75,20 +99,27 @@ class BaseAgent(ABC):
     - Context management
     """
     
+    # Shared service classes (stateless), resolved on the class rather than per instance
+    llm = LLMService
+    db = DatabaseService
+    
     def __init__(self, agent_type: AgentType):
         self.agent_type = agent_type
         self.logger = logging.getLogger(f"agent.{agent_type.value}")
-        self.llm = LLMService
-        self.db = DatabaseService
         
         # Agent-specific system prompt
         self.system_prompt = self._get_system_prompt()
         
-        self.logger.info(f"{agent_type.value} agent initialized")
+        self.logger.info("%s agent initialized", agent_type.value)
     
     @abstractmethod
     def _get_system_prompt(self) -> str:
-        """Return the system prompt for this agent"""
+        """
+        Return the system prompt for this agent
+        
+        Called once from __init__; the result is kept on self.system_prompt
+        and reused for every LLM call, so prompts may be built dynamically.
+        """
         pass
     
     @abstractmethod
@@ -123,23 +154,22 @@ Session Context:
     ) -> str:
         """Generate a response using the LLM"""
         
-        full_prompt = self.system_prompt
-        if additional_context:
-            full_prompt += f"\n\nAdditional Context:\n{additional_context}"
-        
+        # The system prompt is sent unchanged on every call (a stable, cacheable
+        # prefix); turn-specific context travels as its own message
         return self.llm.generate_response(
             user_message=user_message,
             context=context,
             agent_type=self.agent_type.value,
-            system_prompt=full_prompt,
-            conversation_history=context.get("conversation_history", [])
+            system_prompt=self.system_prompt,
+            conversation_history=context.get("conversation_history", []),
+            additional_context=additional_context
         )
     
     def log_action(self, action: str, details: Dict = None):
         """Log an agent action"""
-        self.logger.info(f"[{self.agent_type.value}] {action}")
-        if details:
-            self.logger.debug(f"Details: {details}")
+        self.logger.info("[%s] %s", self.agent_type.value, action)
+        if details and self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Details: %r", details)
     
     def create_handoff_message(
         self,
@@ -149,10 +179,8 @@ Session Context:
         context: Dict
     ) -> AgentMessage:
         """Create a message to hand off to another agent"""
-        import uuid
-        
         return AgentMessage(
-            message_id=str(uuid.uuid4()),
+            message_id=new_message_id(),
             from_agent=self.agent_type,
             to_agent=to_agent,
             intent=intent,
@@ -167,23 +195,35 @@ class AgentRegistry:
     Allows dynamic agent lookup and routing
     """
     
-    _agents: Dict[AgentType, BaseAgent] = {}
+    # One slot per AgentType, indexed by AgentType.index
+    _agents: List[Optional[BaseAgent]] = [None] * len(AgentType)
+    _defaults_registered = False
     
     @classmethod
     def register(cls, agent: BaseAgent):
         """Register an agent"""
-        cls._agents[agent.agent_type] = agent
-        logging.info(f"Registered agent: {agent.agent_type.value}")
+        cls._agents[agent.agent_type.index] = agent
+        logging.info("Registered agent: %s", agent.agent_type.value)
+    
+    @classmethod
+    def _ensure_defaults(cls):
+        """Register the built-in agents on first lookup if startup didn't"""
+        if not cls._defaults_registered:
+            cls._defaults_registered = True
+            from agents import register_agents
+            register_agents()
     
     @classmethod
     def get(cls, agent_type: AgentType) -> Optional[BaseAgent]:
         """Get an agent by type"""
-        return cls._agents.get(agent_type)
+        cls._ensure_defaults()
+        return cls._agents[agent_type.index]
     
     @classmethod
     def get_all(cls) -> Dict[AgentType, BaseAgent]:
         """Get all registered agents"""
-        return cls._agents
+        cls._ensure_defaults()
+        return {agent.agent_type: agent for agent in cls._agents if agent is not None}
     
     @classmethod
     async def route_message(cls, message: AgentMessage) -> AgentResponse:
@@ -196,4 +236,7 @@ class AgentRegistry:
                 message=f"Agent {message.to_agent.value} not found"
             )
         
+        # Cold path: listeners (audit, analytics) run in the background
+        agent_bus.publish(inbox_subject(message.to_agent.value), message)
+        
         return await agent.process(message)
@@ -2,6 +2,7 @@
 Inventory Agent for Agentic AI Retail System
 Handles: Stock checks, Availability, Product details, Alternatives
 """
+import heapq
 import logging
 from typing import Dict, List, Optional, Any
 
@@ -13,6 +14,7 @@ from agents.base_agent import (
     AgentRegistry
 )
 from services.database import DatabaseService
+from services.product_index import product_index
 
 
 class InventoryAgent(BaseAgent):
@@ -67,7 +69,8 @@ Always format stock info clearly:
         intent = message.intent
         context = message.context
         
-        self.log_action(f"Processing: {intent}", {"entities": entities})
+        if self.logger.isEnabledFor(logging.INFO):
+            self.log_action(f"Processing: {intent}", {"entities": entities})
         
         # Determine action based on intent
         if intent in ["check_stock", "check_availability"]:
@@ -85,12 +88,14 @@ Always format stock info clearly:
         
         product_name = entities.get("product_name", "")
         
-        # Search for the product
-        if product_name:
-            products = self.db.search_products(product_name)
-        else:
-            # Try to find product from message
-            products = self.db.search_products(user_message)
+        # Search for the product (fall back to the whole message); the fuzzy
+        # similarity index is only consulted when the name lookup finds nothing
+        query = product_name or user_message
+        products = self.db.search_products(query)
+        if not products:
+            product_ids = product_index.search(query, k=5)
+            if product_ids:
+                products = self.db.get_products_by_ids(product_ids)
         
         if not products:
             response_text = self.generate_response(
@@ -208,25 +213,26 @@ Quantity Available: {stock_info.get('quantity', 0)}
         alternatives = self.db.get_products_by_category(category)
         
         # Filter out the original product and out-of-stock items
-        original_id = product.get("id")
-        valid_alternatives = []
+        original_id = str(product.get("id"))
+        candidates = [alt for alt in alternatives if str(alt.get("id")) != original_id]
         
-        for alt in alternatives:
-            if str(alt.get("id")) == str(original_id):
-                continue
-            
-            stock = self.db.check_stock(alt.get("id"))
+        # One inventory query for the whole category instead of one per product
+        stocks = self.db.check_stock_bulk([alt.get("id") for alt in candidates])
+        
+        valid_alternatives = []
+        for alt in candidates:
+            stock = stocks.get(str(alt.get("id")), {})
             if stock.get("in_stock"):
                 alt["stock_quantity"] = stock.get("quantity")
                 valid_alternatives.append(alt)
         
-        # Sort by price similarity
+        # Closest 5 by price (nsmallest is stable, like the full sort it replaces)
         original_price = product.get("price", 0)
-        valid_alternatives.sort(
+        return heapq.nsmallest(
+            5,
+            valid_alternatives,
             key=lambda x: abs(x.get("price", 0) - original_price)
         )
-        
-        return valid_alternatives[:5]
     
     def _format_stock_status(self, stock_info: Dict) -> str:
         """Format stock status for display"""
@@ -267,6 +273,5 @@ Quantity Available: {stock_info.get('quantity', 0)}
         return True
 
 
-# Create and register the agent
+# Create the agent (registered by agents.bootstrap_agents)
 inventory_agent = InventoryAgent()
-AgentRegistry.register(inventory_agent)
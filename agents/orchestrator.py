@@ -2,9 +2,13 @@
 Master Orchestrator Agent for Agentic AI Retail System
 Handles: Language detection, Mood analysis, Intent classification, Task routing
 """
-import uuid
+import asyncio
+import re
+import time
 import logging
-from typing import Dict, List, Optional, Any
+from collections import deque
+from types import MappingProxyType
+from typing import Dict, List, NamedTuple, Optional, Any, Tuple
 
 from agents.base_agent import (
     BaseAgent, 
@@ -14,8 +18,167 @@ from agents.base_agent import (
     AgentRegistry
 )
 from services.llm_service import LLMService
+from services.llm_batcher import llm_batcher
 from services.database import DatabaseService
-from config import SUPPORTED_LANGUAGES, DEFAULT_LANGUAGE, MOOD_CATEGORIES
+from config import SUPPORTED_LANGUAGES, DEFAULT_LANGUAGE, MOOD_CATEGORIES, MAX_CONVERSATION_HISTORY
+
+
+GREETINGS = MappingProxyType({
+    "en": "Hello! Welcome to our store. How can I help you today?",
+    "es": "¡Hola! Bienvenido a nuestra tienda. ¿Cómo puedo ayudarte hoy?",
+    "fr": "Bonjour! Bienvenue dans notre magasin. Comment puis-je vous aider?",
+    "de": "Hallo! Willkommen in unserem Geschäft. Wie kann ich Ihnen helfen?",
+    "hi": "नमस्ते! हमारी दुकान में आपका स्वागत है। मैं आपकी कैसे मदद कर सकता हूं?",
+})
+
+FAREWELLS = MappingProxyType({
+    "en": "Thank you for visiting! Have a wonderful day!",
+    "es": "¡Gracias por visitarnos! ¡Que tengas un día maravilloso!",
+    "fr": "Merci de votre visite! Passez une excellente journée!",
+    "de": "Danke für Ihren Besuch! Haben Sie einen wunderschönen Tag!",
+})
+
+# Moods that get a reassuring greeting
+_NEGATIVE_MOODS = frozenset({"frustrated", "angry"})
+
+# Routing target name -> worker agent
+_AGENT_TARGETS = MappingProxyType({
+    "recommendation": AgentType.RECOMMENDATION,
+    "inventory": AgentType.INVENTORY,
+    "payment": AgentType.PAYMENT,
+})
+
+_EDGE_CASE_RESPONSES = MappingProxyType({
+    "agent_timeout": "I apologize for the delay. Let me try that again for you.",
+    "agent_error": "I encountered an issue processing your request. Let me try a different approach.",
+    "unknown_intent": "I'm not quite sure what you're looking for. Could you tell me more?",
+    "out_of_scope": "I'm specialized in retail assistance. For other queries, I'd recommend contacting our general support."
+})
+
+# Number of recent messages (2 exchanges) the intent classifier sees as context
+CONTEXT_SUMMARY_SIZE = 4
+
+
+def new_context_summary() -> deque:
+    """Rolling buffer of preformatted recent-message lines for a session"""
+    return deque(maxlen=CONTEXT_SUMMARY_SIZE)
+
+
+class Turn(NamedTuple):
+    """One stored conversation message (a fraction of the size of a dict)"""
+    role: str
+    content: str
+    timestamp: float
+    
+    @classmethod
+    def now(cls, role: str, content: str) -> "Turn":
+        return cls(role, content, time.time())
+
+
+def new_conversation_history() -> deque:
+    """Bounded per-session message history of Turns; the oldest fall off"""
+    return deque(maxlen=MAX_CONVERSATION_HISTORY)
+
+
+def history_snapshot(history) -> List[Dict]:
+    """Message dicts for an orchestrator context, built from stored Turns"""
+    return [turn._asdict() for turn in history]
+
+
+def context_summary_line(role: str, content: str) -> str:
+    """Format one message for the rolling context summary"""
+    return f"{role}: {content[:100]}"
+
+
+def greeting_text(language: str = "en", mood: str = "neutral") -> str:
+    """Localized greeting, adjusted for the customer's mood"""
+    base_greeting = GREETINGS.get(language, GREETINGS["en"])
+    
+    if mood in _NEGATIVE_MOODS:
+        return f"{base_greeting} I'm here to help make things easier for you."
+    elif mood == "happy":
+        return f"{base_greeting} 😊 Great to have you here!"
+    
+    return base_greeting
+
+
+# Keywords in recent conversation that tell us what a bare "yes"/"proceed" confirms
+# (substring matches, so "buying" or "carts" still count). The lookahead makes the
+# matches zero-width, so one scan reports overlapping hits such as "cart" inside
+# "add to cart".
+_CONFIRM_KEYWORDS_RE = re.compile(
+    r"(?=(?P<checkout>checkout|payment|purchase|proceed|cart|buy)"
+    r"|(?P<addcart>add to cart|add it|take it)"
+    r"|(?P<stock>stock|available))",
+    re.IGNORECASE
+)
+
+# Whole-utterance patterns that can be classified without an LLM call
+_FAST_PATTERNS = {
+    "greeting": re.compile(
+        r"^\s*(hi|hello|hey|hiya|good morning|good afternoon|good evening|hola|buenos días|"
+        r"bonjour|salut|hallo|guten tag|namaste|नमस्ते)(?: there)?[\s!.,]*$",
+        re.IGNORECASE
+    ),
+    "farewell": re.compile(
+        r"^\s*(bye|goodbye|bye bye|see you|see ya|adiós|adios|au revoir|tschüss|"
+        r"auf wiedersehen)[\s!.,]*$",
+        re.IGNORECASE
+    ),
+}
+
+# Unambiguous mood words: when a message hits exactly one mood and has no
+# negation, the mood is taken from the match instead of an LLM call
+_MOOD_KEYWORDS_RE = re.compile(
+    r"\b(?:(?P<angry>angry|furious|pissed|outraged|unacceptable|ridiculous)"
+    r"|(?P<frustrated>frustrated|frustrating|annoyed|annoying|fed up|sick of|waste of time)"
+    r"|(?P<confused>confused|confusing|unclear|puzzled|what do you mean)"
+    r"|(?P<happy>happy|awesome|amazing|excellent|wonderful|love it|thank you|thanks))\b",
+    re.IGNORECASE
+)
+_NEGATION_RE = re.compile(r"\b(?:not|no|never|hardly)\b|n't\b", re.IGNORECASE)
+
+# Language implied by a fast-path word (anything not listed is English)
+_FAST_PATH_LANGUAGES = {
+    "hola": "es", "buenos días": "es", "adiós": "es", "adios": "es",
+    "bonjour": "fr", "salut": "fr", "au revoir": "fr",
+    "hallo": "de", "guten tag": "de", "tschüss": "de", "auf wiedersehen": "de",
+    "namaste": "hi", "नमस्ते": "hi",
+}
+
+# Confirmation category -> (intent, target_agent), highest priority first.
+# "add it to your cart?" also mentions the cart, so that explicit phrasing wins
+# over checkout; a generic stock mention ("it's in stock! proceed to
+# checkout?") does not.
+_CONFIRM_ROUTES = {
+    "addcart": ("add_to_cart", "payment"),
+    "checkout": ("checkout", "payment"),
+    "stock": ("add_to_cart", "payment"),
+}
+
+
+def _keyword_mood(text: str) -> Optional[Dict]:
+    """Mood analysis result from unambiguous keywords, or None to ask the LLM"""
+    moods = {}
+    for match in _MOOD_KEYWORDS_RE.finditer(text):
+        moods.setdefault(match.lastgroup, []).append(match.group(0).lower())
+    
+    if len(moods) != 1 or _NEGATION_RE.search(text):
+        return None
+    
+    (mood, indicators), = moods.items()
+    return {
+        "mood": mood,
+        "confidence": 0.8,
+        "indicators": indicators,
+        "suggested_tone": MOOD_CATEGORIES[mood]["response_tone"]
+    }
+
+
+def _confirm_category(text: str) -> Optional[str]:
+    """Highest-priority keyword category found in text, in a single pass"""
+    found = {match.lastgroup for match in _CONFIRM_KEYWORDS_RE.finditer(text)}
+    return next((category for category in _CONFIRM_ROUTES if category in found), None)
 
 
 class OrchestratorAgent(BaseAgent):
@@ -71,35 +234,47 @@ Always acknowledge the user's emotion and respond appropriately:
         
         self.log_action("Processing message", {"input": user_input[:100]})
         
-        # Step 1: Detect language (if not already set)
+        # Recent conversation gives the intent classifier context for confirmations.
+        # Session layers keep a rolling buffer of preformatted lines; fall back to
+        # formatting the history for callers that don't.
+        history = message.context.get("conversation_history", [])
+        rolling_summary = message.context.get("context_summary")
+        if rolling_summary is not None:
+            context_summary = "\n".join(rolling_summary)
+        else:
+            context_summary = "\n".join([
+                context_summary_line(msg.get("role", "user"), msg.get("content", ""))
+                for msg in history[-CONTEXT_SUMMARY_SIZE:]
+            ])
+        
         language = message.context.get("language")
-        if not language or language == "auto":
-            language_result = await self.detect_language(user_input)
+        detect = not language or language == "auto"
+        
+        # Fast path: bare greetings and farewells need no LLM analysis
+        fast_path = self._fast_path(user_input, message.context)
+        if fast_path:
+            language_result, mood_result, intent_result = fast_path
+        else:
+            # Steps 1-3: language, mood and intent are independent - run them concurrently
+            analyses = [
+                self.analyze_mood(user_input, history),
+                self.classify_intent(user_input, context_summary)
+            ]
+            if detect:
+                analyses.append(self.detect_language(user_input))
+            
+            mood_result, intent_result, *language_results = await asyncio.gather(*analyses)
+            language_result = language_results[0] if detect else None
+        
+        if detect:
             language = language_result.get("language_code", DEFAULT_LANGUAGE)
             message.context["language"] = language
             message.context["language_name"] = language_result.get("language_name", "English")
         
-        # Step 2: Analyze mood
-        mood_result = await self.analyze_mood(
-            user_input, 
-            message.context.get("conversation_history", [])
-        )
         message.context["mood"] = mood_result.get("mood", "neutral")
         message.context["mood_confidence"] = mood_result.get("confidence", 0.5)
         message.context["suggested_tone"] = mood_result.get("suggested_tone", "professional")
         
-        # Step 3: Classify intent with conversation context
-        # Get recent conversation for context
-        history = message.context.get("conversation_history", [])
-        context_summary = ""
-        if history:
-            recent = history[-4:]  # Last 2 exchanges
-            context_summary = "\n".join([
-                f"{msg.get('role', 'user')}: {msg.get('content', '')[:100]}"
-                for msg in recent
-            ])
-        
-        intent_result = await self.classify_intent(user_input, context_summary)
         intent = intent_result.get("intent", "general_question")
         target_agent = intent_result.get("target_agent", "orchestrator")
         entities = intent_result.get("entities", {})
@@ -107,17 +282,9 @@ Always acknowledge the user's emotion and respond appropriately:
         # Handle confirm_action by looking at context to determine target
         if intent == "confirm_action":
             # Look at recent history to determine what action to confirm
-            if context_summary:
-                context_lower = context_summary.lower()
-                if any(word in context_lower for word in ["checkout", "payment", "purchase", "proceed", "cart", "buy"]):
-                    intent = "checkout"
-                    target_agent = "payment"
-                elif any(word in context_lower for word in ["add to cart", "add it", "take it"]):
-                    intent = "add_to_cart"
-                    target_agent = "payment"
-                elif any(word in context_lower for word in ["stock", "available", "in stock"]):
-                    intent = "add_to_cart"
-                    target_agent = "payment"
+            category = _confirm_category(context_summary) if context_summary else None
+            if category:
+                intent, target_agent = _CONFIRM_ROUTES[category]
         
         self.log_action("Analysis complete", {
             "language": language,
@@ -151,17 +318,72 @@ Always acknowledge the user's emotion and respond appropriately:
                 context=message.context
             )
     
+    def _fast_path(
+        self,
+        user_input: str,
+        context: Dict
+    ) -> Optional[Tuple[Optional[Dict], Dict, Dict]]:
+        """
+        Classify whole-utterance greetings and farewells without the LLM
+        
+        Confirmations ("yes", "ok") always go to the LLM: what they confirm
+        depends on the conversation, and guessing wrong can place an order.
+        
+        Returns:
+            (language_result, mood_result, intent_result) shaped like the LLM analyses,
+            or None when the full analysis is needed
+        """
+        if len(user_input) > 30:
+            return None
+        
+        for intent, pattern in _FAST_PATTERNS.items():
+            match = pattern.match(user_input)
+            if match:
+                break
+        else:
+            return None
+        
+        language_result = None
+        language = context.get("language")
+        if not language or language == "auto":
+            code = _FAST_PATH_LANGUAGES.get(match.group(1).lower(), DEFAULT_LANGUAGE)
+            language_result = {
+                "language_code": code,
+                "language_name": SUPPORTED_LANGUAGES.get(code, "English"),
+                "confidence": 0.9
+            }
+        
+        # Mood carries over from the previous turn
+        mood_result = {
+            "mood": context.get("mood", "neutral"),
+            "confidence": context.get("mood_confidence", 0.5),
+            "indicators": [],
+            "suggested_tone": context.get("suggested_tone", "professional")
+        }
+        
+        intent_result = {
+            "intent": intent,
+            "confidence": 1.0,
+            "entities": {},
+            "target_agent": "orchestrator"
+        }
+        
+        return language_result, mood_result, intent_result
+    
+    # Analysis calls go through the micro-batcher, which runs the synchronous
+    # Groq client in worker threads and coalesces calls across sessions.
+    
     async def detect_language(self, text: str) -> Dict:
         """Detect the language of user input"""
-        return self.llm.detect_language(text)
+        return await llm_batcher.submit("language", text)
     
     async def analyze_mood(self, text: str, history: List[Dict] = None) -> Dict:
-        """Analyze user's mood/sentiment"""
-        return self.llm.analyze_mood(text, history)
+        """Analyze user's mood/sentiment (keywords first, then the LLM)"""
+        return _keyword_mood(text) or await llm_batcher.submit("mood", text, history)
     
     async def classify_intent(self, text: str, context_summary: str = None) -> Dict:
         """Classify user's intent with conversation context"""
-        return self.llm.classify_intent(text, conversation_context=context_summary)
+        return await llm_batcher.submit("intent", text, context_summary)
     
     async def handle_direct(self, user_message: str, context: Dict, intent: str) -> str:
         """Handle messages that don't need routing"""
@@ -175,27 +397,7 @@ Always acknowledge the user's emotion and respond appropriately:
     
     async def generate_greeting(self, context: Dict) -> str:
         """Generate a personalized greeting"""
-        
-        language = context.get("language", "en")
-        mood = context.get("mood", "neutral")
-        
-        greetings = {
-            "en": "Hello! Welcome to our store. How can I help you today?",
-            "es": "¡Hola! Bienvenido a nuestra tienda. ¿Cómo puedo ayudarte hoy?",
-            "fr": "Bonjour! Bienvenue dans notre magasin. Comment puis-je vous aider?",
-            "de": "Hallo! Willkommen in unserem Geschäft. Wie kann ich Ihnen helfen?",
-            "hi": "नमस्ते! हमारी दुकान में आपका स्वागत है। मैं आपकी कैसे मदद कर सकता हूं?",
-        }
-        
-        base_greeting = greetings.get(language, greetings["en"])
-        
-        # Adjust based on mood
-        if mood == "frustrated" or mood == "angry":
-            return f"{base_greeting} I'm here to help make things easier for you."
-        elif mood == "happy":
-            return f"{base_greeting} 😊 Great to have you here!"
-        
-        return base_greeting
+        return greeting_text(context.get("language", "en"), context.get("mood", "neutral"))
     
     async def generate_farewell(self, context: Dict) -> str:
         """Generate a personalized farewell"""
@@ -203,14 +405,7 @@ Always acknowledge the user's emotion and respond appropriately:
         language = context.get("language", "en")
         cart = context.get("cart", [])
         
-        farewells = {
-            "en": "Thank you for visiting! Have a wonderful day!",
-            "es": "¡Gracias por visitarnos! ¡Que tengas un día maravilloso!",
-            "fr": "Merci de votre visite! Passez une excellente journée!",
-            "de": "Danke für Ihren Besuch! Haben Sie einen wunderschönen Tag!",
-        }
-        
-        base_farewell = farewells.get(language, farewells["en"])
+        base_farewell = FAREWELLS.get(language, FAREWELLS["en"])
         
         if cart:
             return f"{base_farewell} Don't forget - you have {len(cart)} items in your cart! Feel free to return anytime to complete your purchase."
@@ -227,14 +422,7 @@ Always acknowledge the user's emotion and respond appropriately:
     ) -> AgentResponse:
         """Route request to appropriate worker agent"""
         
-        # Map string to AgentType
-        agent_map = {
-            "recommendation": AgentType.RECOMMENDATION,
-            "inventory": AgentType.INVENTORY,
-            "payment": AgentType.PAYMENT,
-        }
-        
-        agent_type = agent_map.get(target_agent)
+        agent_type = _AGENT_TARGETS.get(target_agent)
         
         if not agent_type:
             return AgentResponse(
@@ -254,7 +442,8 @@ Always acknowledge the user's emotion and respond appropriately:
             context=context
         )
         
-        self.log_action(f"Routing to {target_agent}", {"intent": intent})
+        if self.logger.isEnabledFor(logging.INFO):
+            self.log_action(f"Routing to {target_agent}", {"intent": intent})
         
         # Route through registry
         return await AgentRegistry.route_message(handoff)
@@ -262,14 +451,7 @@ Always acknowledge the user's emotion and respond appropriately:
     async def handle_edge_case(self, error_type: str, context: Dict) -> AgentResponse:
         """Handle edge cases and errors gracefully"""
         
-        error_responses = {
-            "agent_timeout": "I apologize for the delay. Let me try that again for you.",
-            "agent_error": "I encountered an issue processing your request. Let me try a different approach.",
-            "unknown_intent": "I'm not quite sure what you're looking for. Could you tell me more?",
-            "out_of_scope": "I'm specialized in retail assistance. For other queries, I'd recommend contacting our general support."
-        }
-        
-        message = error_responses.get(error_type, "Something went wrong. Please try again.")
+        message = _EDGE_CASE_RESPONSES.get(error_type, "Something went wrong. Please try again.")
         
         return AgentResponse(
             success=False,
@@ -279,6 +461,5 @@ Always acknowledge the user's emotion and respond appropriately:
         )
 
 
-# Create and register the orchestrator
+# Create the orchestrator (registered by agents.bootstrap_agents)
 orchestrator = OrchestratorAgent()
-AgentRegistry.register(orchestrator)
@@ -3,7 +3,9 @@ Payment Agent for Agentic AI Retail System
 Handles: Checkout, Payment processing, Order completion, Error recovery
 """
 import logging
-import uuid
+import random
+import secrets
+from types import MappingProxyType
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
@@ -18,6 +20,23 @@ from services.database import DatabaseService
 from config import CURRENCY_SYMBOL, TAX_RATE, PAYMENT_METHODS
 
 
+# Intents that start the checkout flow
+_CHECKOUT_INTENTS = frozenset({"checkout", "make_payment", "pay"})
+
+# Prompt fragments derived from config, formatted once
+_TAX_RATE_TEXT = f"{TAX_RATE * 100}%"
+_PAYMENT_METHODS_TEXT = ", ".join(PAYMENT_METHODS)
+
+# Customer-facing explanations for payment error codes
+_PAYMENT_ERROR_MESSAGES = MappingProxyType({
+    "CARD_DECLINED": "The card was declined. Please try a different card or payment method.",
+    "INSUFFICIENT_FUNDS": "There were insufficient funds. Would you like to try a different payment method?",
+    "EXPIRED_CARD": "The card appears to be expired. Please update your card details.",
+    "NETWORK_ERROR": "We experienced a network issue. Please try again.",
+    "UNKNOWN": "Something went wrong with the payment. Please try again."
+})
+
+
 class PaymentAgent(BaseAgent):
     """
     Payment Agent
@@ -32,6 +51,14 @@ class PaymentAgent(BaseAgent):
     
     def __init__(self):
         super().__init__(AgentType.PAYMENT)
+        
+        # intent -> handler(user_message, entities, context); checkout
+        # intents are dispatched directly in process()
+        self._intent_handlers = {
+            "view_cart": lambda msg, entities, ctx: self.handle_view_cart(ctx),
+            "cart": lambda msg, entities, ctx: self.handle_view_cart(ctx),
+            "add_to_cart": lambda msg, entities, ctx: self.handle_add_to_cart(entities, ctx),
+        }
     
     def _get_system_prompt(self) -> str:
         return f"""You are a Payment & Checkout Specialist for an AI-powered retail assistant.
@@ -50,8 +77,8 @@ Checkout flow:
 4. Process payment
 5. Confirm order
 
-Payment methods supported: {', '.join(PAYMENT_METHODS)}
-Tax rate: {TAX_RATE * 100}%
+Payment methods supported: {_PAYMENT_METHODS_TEXT}
+Tax rate: {_TAX_RATE_TEXT}
 Currency: USD ({CURRENCY_SYMBOL})
 
 Key behaviors:
@@ -84,17 +111,16 @@ TOTAL: $XX.XX"""
         intent = message.intent
         context = message.context
         
-        self.log_action(f"Processing: {intent}", {"entities": entities})
+        if self.logger.isEnabledFor(logging.INFO):
+            self.log_action(f"Processing: {intent}", {"entities": entities})
         
-        # Determine action based on intent
-        if intent in ["checkout", "make_payment", "pay"]:
+        # Determine action based on intent; checkout is the hot path
+        if intent in _CHECKOUT_INTENTS:
             return await self.handle_checkout(user_message, context)
-        elif intent in ["view_cart", "cart"]:
-            return await self.handle_view_cart(context)
-        elif intent == "add_to_cart":
-            return await self.handle_add_to_cart(entities, context)
-        else:
+        handler = self._intent_handlers.get(intent)
+        if handler is None:
             return await self.handle_general(user_message, context)
+        return await handler(user_message, entities, context)
     
     async def handle_view_cart(self, context: Dict) -> AgentResponse:
         """Show current cart contents"""
@@ -124,7 +150,7 @@ Cart Contents:
 {cart_summary['items_text']}
 
 Subtotal: {CURRENCY_SYMBOL}{cart_summary['subtotal']:.2f}
-Tax ({TAX_RATE * 100}%): {CURRENCY_SYMBOL}{cart_summary['tax']:.2f}
+Tax ({_TAX_RATE_TEXT}): {CURRENCY_SYMBOL}{cart_summary['tax']:.2f}
 Total: {CURRENCY_SYMBOL}{cart_summary['total']:.2f}
 
 Items in cart: {cart_summary['item_count']}
@@ -211,7 +237,11 @@ Items in cart: {cart_summary['item_count']}
         """Handle checkout process"""
         
         session_id = context.get("session_id")
-        cart = self.db.get_cart(session_id) if session_id else context.get("cart", [])
+        if session_id:
+            snapshot = self.db.checkout_snapshot(session_id)
+            cart, stock_by_id = snapshot["items"], snapshot["stock"]
+        else:
+            cart, stock_by_id = context.get("cart", []), None
         
         if not cart:
             response_text = "Your cart is empty! Would you like to browse our products first?"
@@ -227,7 +257,7 @@ Items in cart: {cart_summary['item_count']}
         cart_summary = self._calculate_cart_totals(cart)
         
         # Verify stock for all items
-        stock_issues = await self._verify_cart_stock(cart)
+        stock_issues = await self._verify_cart_stock(cart, stock_by_id)
         
         if stock_issues:
             issues_text = "\n".join([
@@ -256,6 +286,15 @@ Items in cart: {cart_summary['item_count']}
         if payment_result["success"]:
             # Create order
             order_id = await self._create_order(cart, cart_summary, context)
+            if order_id is None:
+                # Stock ran out between verification and the order. The mock
+                # payment needs no refund; a real gateway would void it here.
+                return AgentResponse(
+                    success=False,
+                    message="I'm sorry, some items in your cart just sold out, so I couldn't place your order. Would you like to review your cart?",
+                    data={"error": "stock_changed"},
+                    suggested_actions=["view_cart", "update_quantities", "view_alternatives"]
+                )
             
             # Clear cart
             if session_id:
@@ -313,8 +352,8 @@ Keep the conversation going naturally - don't just end abruptly!
         """Handle general payment questions"""
         
         additional_context = f"""
-Available payment methods: {', '.join(PAYMENT_METHODS)}
-Tax rate: {TAX_RATE * 100}%
+Available payment methods: {_PAYMENT_METHODS_TEXT}
+Tax rate: {_TAX_RATE_TEXT}
 
 Answer the customer's payment-related question.
 """
@@ -334,35 +373,49 @@ Answer the customer's payment-related question.
     def _calculate_cart_totals(self, cart: List[Dict]) -> Dict:
         """Calculate cart totals"""
         
-        subtotal = sum(
-            item.get("price", 0) * item.get("quantity", 1)
-            for item in cart
-        )
+        # One pass over the cart: each line total is computed once and feeds
+        # both the subtotal and the item summary
+        subtotal = 0.0
+        item_count = 0
+        lines = []
+        for item in cart:
+            price = item.get("price", 0)
+            quantity = item.get("quantity", 1)
+            line_total = price * quantity
+            subtotal += line_total
+            item_count += quantity
+            lines.append(f"• {item.get('name', 'Item')} x{quantity} - {CURRENCY_SYMBOL}{line_total:.2f}")
+        
         tax = subtotal * TAX_RATE
         total = subtotal + tax
-        
-        items_text = "\n".join([
-            f"• {item.get('name', 'Item')} x{item.get('quantity', 1)} - {CURRENCY_SYMBOL}{item.get('price', 0) * item.get('quantity', 1):.2f}"
-            for item in cart
-        ])
+        items_text = "\n".join(lines)
         
         return {
             "subtotal": subtotal,
             "tax": tax,
             "total": total,
-            "item_count": sum(item.get("quantity", 1) for item in cart),
+            "item_count": item_count,
             "items_text": items_text
         }
     
-    async def _verify_cart_stock(self, cart: List[Dict]) -> List[Dict]:
+    async def _verify_cart_stock(
+        self,
+        cart: List[Dict],
+        stock_by_id: Optional[Dict[str, Dict]] = None
+    ) -> List[Dict]:
         """Verify stock availability for all cart items"""
         
+        # One inventory query for the whole cart instead of one per item,
+        # skipped when the caller already fetched it with the cart
+        if stock_by_id is None:
+            stock_by_id = self.db.check_stock_bulk([item.get("product_id") for item in cart])
+        
         issues = []
         for item in cart:
             product_id = item.get("product_id")
             quantity = item.get("quantity", 1)
             
-            stock = self.db.check_stock(product_id)
+            stock = stock_by_id.get(str(product_id), {})
             
             if not stock.get("in_stock"):
                 issues.append({
@@ -398,7 +451,6 @@ Answer the customer's payment-related question.
         # In production, integrate with Stripe, PayPal, etc.
         
         # Simulate occasional failures for testing edge cases
-        import random
         if random.random() < 0.05:  # 5% failure rate
             return {
                 "success": False,
@@ -408,7 +460,7 @@ Answer the customer's payment-related question.
         
         return {
             "success": True,
-            "transaction_id": str(uuid.uuid4())[:8].upper(),
+            "transaction_id": secrets.token_hex(4).upper(),
             "amount": total,
             "method": payment_method
         }
@@ -418,8 +470,21 @@ Answer the customer's payment-related question.
         cart: List[Dict],
         cart_summary: Dict,
         context: Dict
-    ) -> str:
-        """Create order in database"""
+    ) -> Optional[str]:
+        """
+        Take the stock for every cart line, then record the order
+        
+        Returns:
+            Order ID, or None if the stock could not be taken (nothing is recorded)
+        """
+        
+        # Update inventory for every line in one all-or-nothing batch
+        if not self.db.update_inventory_bulk([
+            (item.get("product_id"), -item.get("quantity", 1))
+            for item in cart
+        ]):
+            self.log_action("Order failed: stock update rejected", {"items": len(cart)})
+            return None
         
         user_id = context.get("user_id", "guest")
         
@@ -432,17 +497,10 @@ Answer the customer's payment-related question.
         
         if not order_id:
             # Generate fallback order ID
-            order_id = f"ORD-{uuid.uuid4().hex[:8].upper()}"
+            order_id = f"ORD-{secrets.token_hex(4).upper()}"
         
         self.log_action("Order created", {"order_id": order_id})
         
-        # Update inventory
-        for item in cart:
-            self.db.update_inventory(
-                item.get("product_id"),
-                -item.get("quantity", 1)
-            )
-        
         return order_id
     
     async def _handle_payment_failure(
@@ -455,15 +513,7 @@ Answer the customer's payment-related question.
         
         error_code = payment_result.get("error_code", "UNKNOWN")
         
-        error_messages = {
-            "CARD_DECLINED": "The card was declined. Please try a different card or payment method.",
-            "INSUFFICIENT_FUNDS": "There were insufficient funds. Would you like to try a different payment method?",
-            "EXPIRED_CARD": "The card appears to be expired. Please update your card details.",
-            "NETWORK_ERROR": "We experienced a network issue. Please try again.",
-            "UNKNOWN": "Something went wrong with the payment. Please try again."
-        }
-        
-        error_message = error_messages.get(error_code, error_messages["UNKNOWN"])
+        error_message = _PAYMENT_ERROR_MESSAGES.get(error_code, _PAYMENT_ERROR_MESSAGES["UNKNOWN"])
         
         response_text = self.generate_response(
             "payment failed",
@@ -483,6 +533,5 @@ Answer the customer's payment-related question.
         )
 
 
-# Create and register the agent
+# Create the agent (registered by agents.bootstrap_agents)
 payment_agent = PaymentAgent()
-AgentRegistry.register(payment_agent)
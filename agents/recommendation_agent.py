@@ -14,6 +14,7 @@ from agents.base_agent import (
 )
 from services.llm_service import LLMService
 from services.database import DatabaseService
+from services.product_index import product_index
 
 
 class RecommendationAgent(BaseAgent):
@@ -30,6 +31,13 @@ class RecommendationAgent(BaseAgent):
     
     def __init__(self):
         super().__init__(AgentType.RECOMMENDATION)
+        
+        # intent -> handler(user_message, entities, context)
+        self._intent_handlers = {
+            "search_product": self.handle_search,
+            "browse_products": self.handle_search,
+            "get_recommendation": self.handle_recommendation,
+        }
     
     def _get_system_prompt(self) -> str:
         return """You are a Product Recommendation Specialist for an AI-powered retail assistant.
@@ -66,15 +74,14 @@ Format product recommendations clearly:
         intent = message.intent
         context = message.context
         
-        self.log_action(f"Processing: {intent}", {"entities": entities})
+        if self.logger.isEnabledFor(logging.INFO):
+            self.log_action(f"Processing: {intent}", {"entities": entities})
         
         # Determine action based on intent
-        if intent in ["search_product", "browse_products"]:
-            return await self.handle_search(user_message, entities, context)
-        elif intent == "get_recommendation":
-            return await self.handle_recommendation(user_message, entities, context)
-        else:
+        handler = self._intent_handlers.get(intent)
+        if handler is None:
             return await self.handle_general(user_message, context)
+        return await handler(user_message, entities, context)
     
     async def handle_search(
         self, 
@@ -98,7 +105,13 @@ Format product recommendations clearly:
         if category:
             products = self.db.get_products_by_category(category)
         elif query:
+            # Name lookup first; the fuzzy similarity index (paraphrases, word
+            # order) only fills in when it finds nothing
             products = self.db.search_products(query)
+            if not products:
+                product_ids = product_index.search(query, k=10)
+                if product_ids:
+                    products = self.db.get_products_by_ids(product_ids)
         else:
             products = self.db.get_all_products(limit=10)
         
@@ -170,25 +183,22 @@ Format product recommendations clearly:
             limit=5
         )
         
-        # Match recommendations to actual products
+        # Match recommendations to actual products; the LLM may return
+        # strings or entries without a product_id, which are dropped
+        valid = [rec for rec in recommendations if isinstance(rec, dict) and rec.get("product_id")]
+        if len(valid) < len(recommendations):
+            self.logger.warning("Skipping %d invalid recommendation(s)", len(recommendations) - len(valid))
+        
+        # get_all_products hands back a private copy of the catalog, so the
+        # matched products are annotated in place rather than copied
+        products_by_id = {str(p.get("id")): p for p in products}
         recommended_products = []
-        for rec in recommendations:
-            # Handle case where rec might be a string or malformed
-            if not isinstance(rec, dict):
-                self.logger.warning(f"Skipping invalid recommendation: {rec}")
-                continue
-            
-            product_id = rec.get("product_id")
-            if not product_id:
-                continue
-                
-            product = next((p for p in products if str(p.get("id")) == str(product_id)), None)
-            if product:
-                # Create a copy to avoid modifying original
-                product_copy = product.copy()
-                product_copy["recommendation_reason"] = rec.get("reason", "")
-                product_copy["mood_match"] = rec.get("mood_match", "")
-                recommended_products.append(product_copy)
+        for rec in valid:
+            product = products_by_id.get(str(rec["product_id"]))
+            if product is not None:
+                product["recommendation_reason"] = rec.get("reason", "")
+                product["mood_match"] = rec.get("mood_match", "")
+                recommended_products.append(product)
         
         if not recommended_products:
             # Fallback to top products
@@ -223,7 +233,12 @@ Keep the conversation flowing naturally!"""
             message=response_text,
             data={
                 "recommendations": recommended_products,
-                "mood": mood,
+                # Same shape as the orchestrator's mood analysis result
+                "mood": {
+                    "mood": mood,
+                    "confidence": context.get("mood_confidence", 0.5),
+                    "suggested_tone": context.get("suggested_tone", "professional")
+                },
                 "personalized": True,
                 "continue_conversation": True
             },
@@ -266,30 +281,22 @@ Help the customer explore our catalog based on their interests."""
     
     def _format_products(self, products: List[Dict]) -> str:
         """Format products for display in prompts"""
-        formatted = []
-        for p in products:
-            price = p.get("price", 0)
-            formatted.append(
-                f"📦 {p.get('name', 'Unknown')} - ${price:.2f}\n"
-                f"   Category: {p.get('category', 'N/A')}\n"
-                f"   {p.get('description', '')[:100]}"
-            )
-        return "\n\n".join(formatted)
+        return "\n\n".join(
+            f"📦 {p.get('name', 'Unknown')} - ${p.get('price', 0):.2f}\n"
+            f"   Category: {p.get('category', 'N/A')}\n"
+            f"   {(p.get('description') or '')[:100]}"
+            for p in products
+        )
     
     def _format_recommendations(self, products: List[Dict]) -> str:
         """Format recommendations with reasons"""
-        formatted = []
-        for p in products:
-            price = p.get("price", 0)
-            reason = p.get("recommendation_reason", "Great choice!")
-            formatted.append(
-                f"⭐ {p.get('name', 'Unknown')} - ${price:.2f}\n"
-                f"   {reason}\n"
-                f"   {p.get('description', '')[:80]}"
-            )
-        return "\n\n".join(formatted)
+        return "\n\n".join(
+            f"⭐ {p.get('name', 'Unknown')} - ${p.get('price', 0):.2f}\n"
+            f"   {p.get('recommendation_reason', 'Great choice!')}\n"
+            f"   {(p.get('description') or '')[:80]}"
+            for p in products
+        )
 
 
-# Create and register the agent
+# Create the agent (registered by agents.bootstrap_agents)
 recommendation_agent = RecommendationAgent()
-AgentRegistry.register(recommendation_agent)
@@ -25,16 +25,42 @@ Architecture:
 └─────────────────────────────────────────────────────────────────┘
 """
 import asyncio
-import uuid
+import base64
+import re
+import secrets
 import logging
 import json
-from typing import Dict, Optional, Callable, Any
+from collections import deque
+from typing import AsyncIterator, Awaitable, Dict, List, Optional, Callable, Any
 from dataclasses import dataclass, field
 from enum import Enum
-from datetime import datetime
+
+from agents.base_agent import new_message_id
+from agents.orchestrator import Turn, history_snapshot, new_context_summary, new_conversation_history
+from services.session_store import SessionStore
+from services.timestamps import now_iso
+from config import MAX_ACTIVE_SESSIONS, SESSION_TIMEOUT_MINUTES
 
 logger = logging.getLogger(__name__)
 
+# Responses are synthesized sentence by sentence so the first audio is ready
+# after one short TTS call instead of one call over the whole reply
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+TTS_CHUNK_MAX_WORDS = 80
+
+# Socket closes started from synchronous eviction paths, referenced until done
+_closing_tasks: set = set()
+
+
+def split_sentences(text: str, max_words: int = TTS_CHUNK_MAX_WORDS) -> List[str]:
+    """Split a response into sentence-sized TTS chunks of at most max_words"""
+    chunks = []
+    for sentence in _SENTENCE_END_RE.split(text or ""):
+        words = sentence.split()
+        for i in range(0, len(words), max_words):
+            chunks.append(" ".join(words[i:i + max_words]))
+    return chunks
+
 
 class VoiceState(Enum):
     """Voice session states"""
@@ -46,7 +72,7 @@ class VoiceState(Enum):
     ERROR = "error"
 
 
-@dataclass
+@dataclass(slots=True)
 class VoiceSession:
     """Voice session data"""
     session_id: str
@@ -55,9 +81,10 @@ class VoiceSession:
     language: str = "en"
     mood: str = "neutral"
     cart: list = field(default_factory=list)
-    conversation_history: list = field(default_factory=list)
+    conversation_history: deque = field(default_factory=new_conversation_history)
+    context_summary: deque = field(default_factory=new_context_summary)
     state: VoiceState = VoiceState.DISCONNECTED
-    created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    created_at: str = field(default_factory=now_iso)
     
     def to_context(self) -> Dict:
         """Convert to orchestrator context format"""
@@ -68,7 +95,8 @@ class VoiceSession:
             "language": self.language,
             "mood": self.mood,
             "cart": self.cart,
-            "conversation_history": self.conversation_history
+            "conversation_history": history_snapshot(self.conversation_history),
+            "context_summary": self.context_summary
         }
 
 
@@ -87,9 +115,22 @@ class VoiceAgent:
     """
     
     def __init__(self):
-        self.sessions: Dict[str, VoiceSession] = {}
+        # Bounded like the API session store; idle sessions release their sockets
+        self.sessions = SessionStore(
+            MAX_ACTIVE_SESSIONS,
+            SESSION_TIMEOUT_MINUTES * 60,
+            on_evict=lambda session_id, _: self._release_connections(session_id)
+        )
         self._deepgram = None
         self._streaming_connections: Dict[str, Any] = {}
+        # Persistent TTS sockets per session (see _synthesize)
+        self._tts_connections: Dict[str, Any] = {}
+        # In-flight sentence TTS tasks per session, cancelled on barge-in
+        self._tts_tasks: Dict[str, List[asyncio.Task]] = {}
+        # Fire-and-forget TTS warmups, referenced until done
+        self._warmup_tasks: set = set()
+        # Welcome TTS results keyed by (text, voice); one entry per language/mood
+        self._welcome_audio: Dict[tuple, Dict[str, Any]] = {}
         
         logger.info("VoiceAgent initialized - routes to Master Orchestrator")
     
@@ -108,12 +149,12 @@ class VoiceAgent:
     def create_session(self, user_id: str = None) -> VoiceSession:
         """Create a new voice session"""
         session = VoiceSession(
-            session_id=str(uuid.uuid4()),
-            user_id=user_id or f"voice_user_{uuid.uuid4().hex[:8]}",
+            session_id=secrets.token_hex(16),
+            user_id=user_id or f"voice_user_{secrets.token_hex(4)}",
             state=VoiceState.CONNECTED
         )
         self.sessions[session.session_id] = session
-        logger.info(f"Voice session created: {session.session_id}")
+        logger.info("Voice session created: %s", session.session_id)
         return session
     
     def get_session(self, session_id: str) -> Optional[VoiceSession]:
@@ -124,11 +165,59 @@ class VoiceAgent:
         """End and cleanup a voice session"""
         if session_id in self.sessions:
             del self.sessions[session_id]
-            logger.info(f"Voice session ended: {session_id}")
+            logger.info("Voice session ended: %s", session_id)
         
+        self._release_connections(session_id)
+    
+    def _release_connections(self, session_id: str):
+        """Drop a session's streaming connection, pending speech and TTS socket"""
         # Cleanup streaming connection if exists
         if session_id in self._streaming_connections:
             del self._streaming_connections[session_id]
+        
+        self.cancel_speech(session_id)
+        
+        tts = self._tts_connections.pop(session_id, None)
+        if tts:
+            try:
+                task = asyncio.get_running_loop().create_task(tts.close())
+            except RuntimeError:
+                return
+            _closing_tasks.add(task)
+            task.add_done_callback(_closing_tasks.discard)
+    
+    def _get_tts(self, session_id: str):
+        """Get or create the session's persistent TTS socket"""
+        tts = self._tts_connections.get(session_id)
+        if tts is None:
+            from services.deepgram_service import DeepgramStreamingTTS
+            tts = self._tts_connections[session_id] = DeepgramStreamingTTS(self.deepgram.config)
+        return tts
+    
+    def _warmup_tts(self, session_id: str):
+        """Start opening the session's TTS socket in the background"""
+        task = asyncio.create_task(self._get_tts(session_id).warmup())
+        self._warmup_tasks.add(task)
+        task.add_done_callback(self._warmup_tasks.discard)
+    
+    async def _synthesize(self, session_id: str, text: str) -> Dict[str, Any]:
+        """
+        Synthesize a reply over the session's persistent TTS socket
+        
+        Falls back to the REST endpoint if the socket can't be used.
+        Returns the same shape as DeepgramService.synthesize_speech_base64.
+        """
+        tts = self._get_tts(session_id)
+        audio = await tts.synthesize(text)
+        if audio is None:
+            return await self.deepgram.synthesize_speech_base64(text)
+        
+        return {
+            "success": True,
+            "audio": audio,
+            "audio_base64": base64.b64encode(audio).decode("utf-8"),
+            "content_type": tts.content_type
+        }
     
     # =========================================================================
     # CORE VOICE PROCESSING
@@ -166,6 +255,10 @@ class VoiceAgent:
         session.state = VoiceState.PROCESSING
         
         try:
+            # Open the TTS socket while STT and the orchestrator run; the
+            # socket's lock makes the later synthesize wait for the handshake
+            self._warmup_tts(session_id)
+            
             # Step 1: Speech to Text
             stt_result = await self.deepgram.transcribe_audio(audio_data, mime_type)
             
@@ -188,14 +281,14 @@ class VoiceAgent:
                     "session_id": session_id
                 }
             
-            logger.info(f"[Voice] Transcribed: {transcript[:50]}...")
+            logger.info("[Voice] Transcribed: %.50s...", transcript)
             
             # Step 2: Process through Master Orchestrator
             response = await self._route_to_orchestrator(session, transcript)
             
             # Step 3: Text to Speech
             session.state = VoiceState.SPEAKING
-            tts_result = await self.deepgram.synthesize_speech_base64(response["message"])
+            tts_result = await self._synthesize(session_id, response["message"])
             
             session.state = VoiceState.LISTENING
             
@@ -205,7 +298,7 @@ class VoiceAgent:
                 "transcript": transcript,
                 "response_text": response["message"],
                 "response_audio_base64": tts_result.get("audio_base64") if tts_result["success"] else None,
-                "audio_content_type": tts_result.get("content_type", "audio/wav"),
+                "audio_content_type": tts_result.get("content_type", self.deepgram.tts_content_type),
                 "data": response.get("data", {}),
                 "suggested_actions": response.get("suggested_actions", []),
                 "context": {
@@ -215,7 +308,7 @@ class VoiceAgent:
             }
             
         except Exception as e:
-            logger.error(f"Voice processing error: {e}")
+            logger.error("Voice processing error: %s", e)
             session.state = VoiceState.ERROR
             return {
                 "success": False,
@@ -265,17 +358,17 @@ class VoiceAgent:
             # Generate TTS if requested and Deepgram is available
             if generate_audio and self.deepgram:
                 session.state = VoiceState.SPEAKING
-                tts_result = await self.deepgram.synthesize_speech_base64(response["message"])
+                tts_result = await self._synthesize(session_id, response["message"])
                 
                 if tts_result["success"]:
                     result["response_audio_base64"] = tts_result.get("audio_base64")
-                    result["audio_content_type"] = tts_result.get("content_type", "audio/wav")
+                    result["audio_content_type"] = tts_result.get("content_type", self.deepgram.tts_content_type)
             
             session.state = VoiceState.LISTENING
             return result
             
         except Exception as e:
-            logger.error(f"Text processing error: {e}")
+            logger.error("Text processing error: %s", e)
             session.state = VoiceState.ERROR
             return {
                 "success": False,
@@ -283,6 +376,101 @@ class VoiceAgent:
                 "session_id": session_id
             }
     
+    async def process_text_stream(
+        self,
+        session_id: str,
+        text: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process text input and stream the spoken reply sentence by sentence
+        
+        Yields a "response" event with the full reply text as soon as the
+        orchestrator answers, then one "audio" event per sentence in order.
+        All sentences are synthesized concurrently, so the first one can be
+        played while the rest are still being generated.
+        """
+        session = self.get_session(session_id)
+        if not session:
+            yield {"type": "error", "success": False, "error": "Session not found"}
+            return
+        
+        session.state = VoiceState.PROCESSING
+        
+        try:
+            response = await self._route_to_orchestrator(session, text)
+        except Exception as e:
+            logger.error("Text processing error: %s", e)
+            session.state = VoiceState.ERROR
+            yield {"type": "error", "success": False, "error": str(e), "session_id": session_id}
+            return
+        
+        yield {
+            "type": "response",
+            "success": True,
+            "session_id": session_id,
+            "response_text": response["message"],
+            "data": response.get("data", {}),
+            "suggested_actions": response.get("suggested_actions", []),
+            "context": {
+                "mood": session.mood,
+                "language": session.language
+            }
+        }
+        
+        try:
+            if self.deepgram:
+                session.state = VoiceState.SPEAKING
+                async for event in self._synthesize_sentences(session_id, response["message"]):
+                    yield event
+        finally:
+            # Also reached when the consumer is cancelled (barge-in)
+            session.state = VoiceState.LISTENING
+    
+    async def _synthesize_sentences(
+        self,
+        session_id: str,
+        text: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Start TTS for every sentence at once and yield the audio in order"""
+        sentences = split_sentences(text)
+        tasks = [
+            asyncio.create_task(self.deepgram.synthesize_speech_base64(sentence))
+            for sentence in sentences
+        ]
+        self._tts_tasks[session_id] = tasks
+        
+        try:
+            for index, (sentence, task) in enumerate(zip(sentences, tasks)):
+                try:
+                    tts_result = await task
+                except asyncio.CancelledError:
+                    # Barge-in cancelled the synthesis; a cancellation of our
+                    # own consumer still propagates
+                    if asyncio.current_task().cancelling():
+                        raise
+                    return
+                if not tts_result["success"]:
+                    logger.warning("TTS failed for sentence %d: %s", index, tts_result.get("error"))
+                    continue
+                yield {
+                    "type": "audio",
+                    "index": index,
+                    "text": sentence,
+                    "audio_base64": tts_result.get("audio_base64"),
+                    "content_type": tts_result.get("content_type", self.deepgram.tts_content_type),
+                    "is_last": index == len(sentences) - 1
+                }
+        finally:
+            for task in tasks:
+                task.cancel()
+            if self._tts_tasks.get(session_id) is tasks:
+                del self._tts_tasks[session_id]
+    
+    def cancel_speech(self, session_id: str):
+        """Cancel any sentence synthesis still in flight (e.g. user barge-in)"""
+        for task in self._tts_tasks.pop(session_id, ()):
+            task.cancel()
+    
     async def _route_to_orchestrator(
         self, 
         session: VoiceSession, 
@@ -298,17 +486,15 @@ class VoiceAgent:
         - Routing to worker agents (Recommendation, Inventory, Payment)
         - Response generation
         """
-        from agents import orchestrator, AgentMessage, AgentType
+        from agents import orchestrator, AgentMessage, AgentType, context_summary_line
         
         # Add to conversation history
-        session.conversation_history.append({
-            "role": "user",
-            "content": user_input
-        })
+        session.conversation_history.append(Turn.now("user", user_input))
+        session.context_summary.append(context_summary_line("user", user_input))
         
         # Create message for Master Orchestrator
         message = AgentMessage(
-            message_id=str(uuid.uuid4()),
+            message_id=new_message_id(),
             from_agent=AgentType.ORCHESTRATOR,
             to_agent=AgentType.ORCHESTRATOR,
             intent="process_input",
@@ -322,10 +508,7 @@ class VoiceAgent:
         # Update session with response data
         mood_data = response.data.get("mood")
         if mood_data:
-            if isinstance(mood_data, dict):
-                session.mood = mood_data.get("mood", "neutral")
-            else:
-                session.mood = mood_data
+            session.mood = mood_data.get("mood", "neutral")
         
         if response.data.get("language"):
             session.language = response.data["language"]
@@ -335,10 +518,8 @@ class VoiceAgent:
             session.cart = response.data["cart"]
         
         # Add assistant response to history
-        session.conversation_history.append({
-            "role": "assistant",
-            "content": response.message
-        })
+        session.conversation_history.append(Turn.now("assistant", response.message))
+        session.context_summary.append(context_summary_line("assistant", response.message))
         
         return {
             "success": response.success,
@@ -370,7 +551,7 @@ class VoiceAgent:
         """
         session = self.get_session(session_id)
         if not session:
-            logger.error(f"Session not found: {session_id}")
+            logger.error("Session not found: %s", session_id)
             return False
         
         if not self.deepgram:
@@ -410,18 +591,35 @@ class VoiceAgent:
         if success:
             self._streaming_connections[session_id] = streaming
             session.state = VoiceState.LISTENING
-            logger.info(f"Streaming started for session: {session_id}")
+            logger.info("Streaming started for session: %s", session_id)
         
         return success
     
+    def get_audio_sink(
+        self,
+        session_id: str
+    ) -> Optional[Callable[[bytes], Awaitable[None]]]:
+        """
+        Get the send coroutine of a session's streaming connection
+
+        Resolve this once after start_streaming() and hold it in the receive
+        loop, so each audio frame goes straight to the socket without a
+        per-chunk session lookup. _streaming_connections is then only needed
+        for teardown in stop_streaming().
+        """
+        streaming = self._streaming_connections.get(session_id)
+        return streaming.send_audio if streaming else None
+
     async def send_audio_chunk(self, session_id: str, audio_chunk: bytes):
-        """Send audio chunk for real-time streaming"""
+        """Send audio chunk for real-time streaming (prefer get_audio_sink in loops)"""
         streaming = self._streaming_connections.get(session_id)
         if streaming:
             await streaming.send_audio(audio_chunk)
     
     async def stop_streaming(self, session_id: str):
         """Stop streaming for a session"""
+        self.cancel_speech(session_id)
+        
         streaming = self._streaming_connections.get(session_id)
         if streaming:
             await streaming.close()
@@ -431,7 +629,7 @@ class VoiceAgent:
             if session:
                 session.state = VoiceState.CONNECTED
             
-            logger.info(f"Streaming stopped for session: {session_id}")
+            logger.info("Streaming stopped for session: %s", session_id)
     
     # =========================================================================
     # PROACTIVE SPEAKING
@@ -440,7 +638,8 @@ class VoiceAgent:
     async def speak(
         self, 
         session_id: str, 
-        text: str
+        text: str,
+        audio_format: str = None
     ) -> Dict[str, Any]:
         """
         Proactively speak to the user (not in response to input)
@@ -448,6 +647,8 @@ class VoiceAgent:
         Args:
             session_id: Voice session ID
             text: Text to speak
+            audio_format: "pcm" (default), "wav" or "opus" for clients
+                that cannot play raw PCM
             
         Returns:
             Dict with audio data
@@ -461,7 +662,7 @@ class VoiceAgent:
         
         session.state = VoiceState.SPEAKING
         
-        tts_result = await self.deepgram.synthesize_speech_base64(text)
+        tts_result = await self.deepgram.synthesize_speech_base64(text, audio_format=audio_format)
         
         session.state = VoiceState.LISTENING
         
@@ -470,7 +671,7 @@ class VoiceAgent:
                 "success": True,
                 "text": text,
                 "audio_base64": tts_result.get("audio_base64"),
-                "content_type": tts_result.get("content_type", "audio/wav")
+                "content_type": tts_result.get("content_type", self.deepgram.tts_content_type)
             }
         else:
             return {
@@ -479,17 +680,53 @@ class VoiceAgent:
                 "text": text
             }
     
+    async def speak_stream(self, session_id: str, text: str) -> AsyncIterator[bytes]:
+        """
+        Proactively speak to the user, yielding raw audio bytes as they arrive
+        
+        The streaming counterpart of speak(): no base64 and no buffering of
+        the full clip, so playback can start after the first chunk.
+        """
+        session = self.get_session(session_id)
+        if not session or not self.deepgram:
+            return
+        
+        session.state = VoiceState.SPEAKING
+        try:
+            async for chunk in self.deepgram.synthesize_speech_stream(text):
+                yield chunk
+        finally:
+            session.state = VoiceState.LISTENING
+    
     async def generate_welcome(self, session_id: str) -> Dict[str, Any]:
-        """Generate and speak a welcome message"""
+        """
+        Generate and speak a welcome message
+        
+        The greeting only depends on language and mood, so it is built from
+        the static greeting table instead of a full orchestrator turn, and
+        its audio is synthesized once per (text, voice) and then reused.
+        """
+        from agents import greeting_text, context_summary_line
+        
         session = self.get_session(session_id)
         if not session:
             return {"success": False, "error": "Session not found"}
         
-        # Get welcome from orchestrator
-        response = await self._route_to_orchestrator(session, "hello")
+        text = greeting_text(session.language, session.mood)
+        session.conversation_history.append(Turn.now("assistant", text))
+        session.context_summary.append(context_summary_line("assistant", text))
+        
+        if not self.deepgram:
+            return {"success": False, "error": "Deepgram not configured", "text": text}
+        
+        key = (text, self.deepgram.config.tts_voice.value)
+        cached = self._welcome_audio.get(key)
+        if cached is None:
+            cached = await self.speak(session_id, text)
+            if cached["success"]:
+                self._welcome_audio[key] = cached
         
-        # Generate audio
-        return await self.speak(session_id, response["message"])
+        return dict(cached)
 
 
 # =============================================================================
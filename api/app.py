@@ -2,22 +2,43 @@
 REST API for Agentic AI Retail System
 Provides endpoints for web, mobile, and kiosk interfaces
 """
-import uuid
+import asyncio
+import base64
+import json
 import logging
+import secrets
 from datetime import datetime
 from typing import Dict, Optional
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+try:
+    import orjson  # noqa: F401 - required by ORJSONResponse
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    DefaultResponse = JSONResponse
 from pydantic import BaseModel, Field
 
 from agents import (
     AgentType,
     AgentMessage,
     AgentRegistry,
-    orchestrator
+    bootstrap_agents,
+    orchestrator,
+    new_context_summary,
+    new_conversation_history,
+    history_snapshot,
+    context_summary_line,
+    Turn,
+    get_voice_agent
 )
+from agents.base_agent import new_message_id
 from services.database import DatabaseService
+from services.deepgram_service import close_deepgram_service
+from services.voice_service import handle_voice_websocket
+from services.session_store import SessionStore
+from services.timestamps import now_iso
+from config import MAX_ACTIVE_SESSIONS, SESSION_TIMEOUT_MINUTES, TAX_RATE
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -27,7 +48,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Agentic AI Retail System",
     description="Multi-modal AI-powered retail assistant with mood detection and personalization",
-    version="1.0.0-mvp"
+    version="1.0.0-mvp",
+    default_response_class=DefaultResponse
 )
 
 # CORS middleware for web/mobile access
@@ -39,6 +61,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.on_event("startup")
+async def startup():
+    """Register agents and warm caches before serving requests"""
+    await bootstrap_agents()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close pooled outbound connections"""
+    await close_deepgram_service()
+
+
 # =============================================================================
 # REQUEST/RESPONSE MODELS
 # =============================================================================
@@ -79,18 +114,20 @@ class CartRequest(BaseModel):
 # SESSION MANAGEMENT
 # =============================================================================
 
-# In-memory session store (use Redis in production)
-sessions: Dict[str, Dict] = {}
+# In-memory session store, bounded by count and idle time (use Redis in production)
+sessions = SessionStore(MAX_ACTIVE_SESSIONS, SESSION_TIMEOUT_MINUTES * 60)
 
 
 def get_or_create_session(session_id: Optional[str], user_id: Optional[str], channel: str) -> Dict:
     """Get existing session or create new one"""
     
-    if session_id and session_id in sessions:
-        return sessions[session_id]
+    if session_id:
+        session = sessions.get(session_id)
+        if session is not None:
+            return session
     
     # Create new session
-    new_session_id = session_id or str(uuid.uuid4())
+    new_session_id = session_id or secrets.token_hex(16)
     
     session = {
         "id": new_session_id,
@@ -101,25 +138,38 @@ def get_or_create_session(session_id: Optional[str], user_id: Optional[str], cha
         "mood_confidence": 0.0,
         "suggested_tone": "professional",
         "cart": [],
-        "conversation_history": [],
+        "conversation_history": new_conversation_history(),
+        "context_summary": new_context_summary(),
         "context": {},
-        "created_at": datetime.utcnow().isoformat(),
-        "last_activity": datetime.utcnow().isoformat()
+        "created_at": now_iso(),
+        "last_activity": now_iso()
     }
     
     sessions[new_session_id] = session
     
-    # Also create in database
-    DatabaseService.create_session(session["user_id"], channel)
+    # Also create in database - off the request path, nothing here needs the row
+    _run_in_background(DatabaseService.create_session, session["user_id"], channel)
     
     return session
 
 
+# Strong references to fire-and-forget tasks until they finish
+_background_tasks = set()
+
+
+def _run_in_background(func, *args):
+    """Run a blocking call in a worker thread without awaiting it"""
+    task = asyncio.create_task(asyncio.to_thread(func, *args))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
 def update_session(session_id: str, updates: Dict):
     """Update session data"""
-    if session_id in sessions:
-        sessions[session_id].update(updates)
-        sessions[session_id]["last_activity"] = datetime.utcnow().isoformat()
+    session = sessions.get(session_id)
+    if session is not None:
+        session.update(updates)
+        session["last_activity"] = now_iso()
 
 
 # =============================================================================
@@ -155,22 +205,38 @@ async def create_session(request: SessionRequest):
 async def get_session(session_id: str):
     """Get session details"""
     
-    if session_id not in sessions:
+    session = sessions.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
     return {
         "success": True,
-        "session": sessions[session_id]
+        "session": {
+            **session,
+            "conversation_history": _history_for_api(session["conversation_history"])
+        }
     }
 
 
+def _history_for_api(history) -> list:
+    """Message dicts with ISO-8601 timestamps, as the API has always returned"""
+    return [
+        {**message, "timestamp": datetime.utcfromtimestamp(message["timestamp"]).isoformat()}
+        for message in history_snapshot(history)
+    ]
+
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """
     Main chat endpoint - processes user messages through the orchestrator
+    
+    The reply is returned as a ready-made response so FastAPI skips
+    re-validating it against ChatResponse and running jsonable_encoder over
+    the agent data; ChatResponse still documents the shape in OpenAPI.
     """
     
-    logger.info(f"Chat request: {request.message[:100]}")
+    logger.info("Chat request: %.100s", request.message)
     
     # Get or create session
     session = get_or_create_session(
@@ -179,29 +245,27 @@ async def chat(request: ChatRequest):
         request.channel
     )
     
+    # Add user message to history
+    session["conversation_history"].append(Turn.now("user", request.message))
+    session["context_summary"].append(context_summary_line("user", request.message))
+    
     # Build context from session
     context = {
         "session_id": session["id"],
         "user_id": session["user_id"],
         "channel": session["channel"],
-        "language": request.language or session.get("language", "auto"),
-        "mood": session.get("mood", "neutral"),
-        "mood_confidence": session.get("mood_confidence", 0.0),
-        "suggested_tone": session.get("suggested_tone", "professional"),
-        "cart": session.get("cart", []),
-        "conversation_history": session.get("conversation_history", [])
+        "language": request.language or session["language"],
+        "mood": session["mood"],
+        "mood_confidence": session["mood_confidence"],
+        "suggested_tone": session["suggested_tone"],
+        "cart": session["cart"],
+        "conversation_history": history_snapshot(session["conversation_history"]),
+        "context_summary": session["context_summary"]
     }
     
-    # Add user message to history
-    context["conversation_history"].append({
-        "role": "user",
-        "content": request.message,
-        "timestamp": datetime.utcnow().isoformat()
-    })
-    
     # Create message for orchestrator
     agent_message = AgentMessage(
-        message_id=str(uuid.uuid4()),
+        message_id=new_message_id(),
         from_agent=AgentType.ORCHESTRATOR,  # External request
         to_agent=AgentType.ORCHESTRATOR,
         intent="process_input",
@@ -218,49 +282,45 @@ async def chat(request: ChatRequest):
             "language": response.data.get("language", context["language"]),
             "mood": response.data.get("mood", {}).get("mood", context["mood"]),
             "mood_confidence": response.data.get("mood", {}).get("confidence", 0.0),
-            "suggested_tone": response.data.get("mood", {}).get("suggested_tone", "professional"),
-            "conversation_history": context["conversation_history"] + [{
-                "role": "assistant",
-                "content": response.message,
-                "timestamp": datetime.utcnow().isoformat()
-            }]
+            "suggested_tone": response.data.get("mood", {}).get("suggested_tone", "professional")
         })
+        session["conversation_history"].append(Turn.now("assistant", response.message))
+        session["context_summary"].append(context_summary_line("assistant", response.message))
         
-        return ChatResponse(
-            success=response.success,
-            message=response.message,
-            session_id=session["id"],
-            data=response.data,
-            suggested_actions=response.suggested_actions,
-            context={
+        return DefaultResponse({
+            "success": response.success,
+            "message": response.message,
+            "session_id": session["id"],
+            "data": response.data,
+            "suggested_actions": response.suggested_actions,
+            "context": {
                 "language": response.data.get("language"),
                 "mood": response.data.get("mood", {}).get("mood"),
                 "intent": response.data.get("intent", {}).get("intent"),
                 "handled_by": response.data.get("handled_by")
             }
-        )
+        })
         
     except Exception as e:
-        logger.error(f"Chat processing error: {e}", exc_info=True)
-        return ChatResponse(
-            success=False,
-            message="I apologize, but I'm having trouble processing your request. Please try again.",
-            session_id=session["id"],
-            data={"error": str(e)},
-            suggested_actions=["try_again"],
-            context={}
-        )
+        logger.error("Chat processing error: %s", e, exc_info=True)
+        return DefaultResponse({
+            "success": False,
+            "message": "I apologize, but I'm having trouble processing your request. Please try again.",
+            "session_id": session["id"],
+            "data": {"error": str(e)},
+            "suggested_actions": ["try_again"],
+            "context": {}
+        })
 
 
 @app.post("/api/cart/add")
 async def add_to_cart(request: CartRequest):
     """Add item to cart"""
     
-    if request.session_id not in sessions:
+    session = sessions.get(request.session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    session = sessions[request.session_id]
-    
     # Get product details
     product = DatabaseService.get_product_by_id(request.product_id)
     if not product:
@@ -272,7 +332,7 @@ async def add_to_cart(request: CartRequest):
         raise HTTPException(status_code=400, detail="Product out of stock")
     
     # Add to cart
-    cart = session.get("cart", [])
+    cart = session["cart"]
     
     # Check if already in cart
     for item in cart:
@@ -300,22 +360,27 @@ async def add_to_cart(request: CartRequest):
 async def get_cart(session_id: str):
     """Get cart contents"""
     
-    if session_id not in sessions:
+    session = sessions.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    cart = sessions[session_id].get("cart", [])
+    cart = session["cart"]
     
-    subtotal = sum(item["price"] * item["quantity"] for item in cart)
-    tax = subtotal * 0.08
-    total = subtotal + tax
+    # One pass in integer cents so totals don't pick up float drift
+    subtotal_cents = 0
+    item_count = 0
+    for item in cart:
+        subtotal_cents += round(item["price"] * 100) * item["quantity"]
+        item_count += item["quantity"]
+    tax_cents = round(subtotal_cents * TAX_RATE)
     
     return {
         "success": True,
         "cart": cart,
-        "subtotal": subtotal,
-        "tax": tax,
-        "total": total,
-        "item_count": sum(i["quantity"] for i in cart)
+        "subtotal": subtotal_cents / 100,
+        "tax": tax_cents / 100,
+        "total": (subtotal_cents + tax_cents) / 100,
+        "item_count": item_count
     }
 
 
@@ -402,6 +467,12 @@ class VoiceTextRequest(BaseModel):
     language: Optional[str] = Field(None, description="Detected language")
 
 
+class VoiceSpeakRequest(BaseModel):
+    """Text-to-speech request for a voice session"""
+    session_id: str = Field(..., description="Voice session ID")
+    text: str = Field(..., description="Text to speak")
+
+
 @app.post("/api/voice/text")
 async def voice_text(request: VoiceTextRequest):
     """
@@ -416,13 +487,11 @@ async def voice_text(request: VoiceTextRequest):
         session["language"] = request.language
     
     # Process through orchestrator
-    session["conversation_history"].append({
-        "role": "user",
-        "content": request.transcription
-    })
+    session["conversation_history"].append(Turn.now("user", request.transcription))
+    session["context_summary"].append(context_summary_line("user", request.transcription))
     
     message = AgentMessage(
-        message_id=str(uuid.uuid4()),
+        message_id=new_message_id(),
         from_agent=AgentType.ORCHESTRATOR,
         to_agent=AgentType.ORCHESTRATOR,
         intent="process_input",
@@ -431,10 +500,11 @@ async def voice_text(request: VoiceTextRequest):
             "session_id": session["id"],
             "user_id": session["user_id"],
             "channel": "voice",
-            "language": session.get("language", "auto"),
-            "mood": session.get("mood", "neutral"),
-            "cart": session.get("cart", []),
-            "conversation_history": session.get("conversation_history", [])
+            "language": session["language"],
+            "mood": session["mood"],
+            "cart": session["cart"],
+            "conversation_history": history_snapshot(session["conversation_history"]),
+            "context_summary": session["context_summary"]
         }
     )
     
@@ -443,27 +513,23 @@ async def voice_text(request: VoiceTextRequest):
     # Update session
     mood_data = response.data.get("mood")
     if mood_data:
-        if isinstance(mood_data, dict):
-            session["mood"] = mood_data.get("mood", "neutral")
-        else:
-            session["mood"] = mood_data
-    
-    session["conversation_history"].append({
-        "role": "assistant",
-        "content": response.message
-    })
+        session["mood"] = mood_data.get("mood", "neutral")
     
-    return {
+    session["conversation_history"].append(Turn.now("assistant", response.message))
+    session["context_summary"].append(context_summary_line("assistant", response.message))
+    
+    # Ready-made response: skips jsonable_encoder's walk over the agent data
+    return DefaultResponse({
         "success": True,
         "message": response.message,  # Text for TTS
         "session_id": session["id"],
         "data": response.data,
         "suggested_actions": response.suggested_actions,
         "context": {
-            "mood": session.get("mood"),
-            "language": session.get("language")
+            "mood": session["mood"],
+            "language": session["language"]
         }
-    }
+    })
 
 
 @app.websocket("/ws/voice/{session_id}")
@@ -477,14 +543,12 @@ async def voice_websocket(websocket, session_id: str):
     - Server → Client: {"type": "response", "text": "...", "audio": "base64_audio"}
     - Server → Client: {"type": "transcript", "text": "...", "is_final": true/false}
     """
-    from services.voice_service import handle_voice_websocket
-    
     await websocket.accept()
     
     try:
         await handle_voice_websocket(websocket, session_id)
     except Exception as e:
-        logger.error(f"Voice WebSocket error: {e}")
+        logger.error("Voice WebSocket error: %s", e)
     finally:
         try:
             await websocket.close()
@@ -495,8 +559,6 @@ async def voice_websocket(websocket, session_id: str):
 @app.post("/api/voice/session")
 async def create_voice_session(user_id: Optional[str] = None):
     """Create a new voice session"""
-    from agents.voice_agent import get_voice_agent
-    
     voice_agent = get_voice_agent()
     session = voice_agent.create_session(user_id)
     
@@ -520,9 +582,6 @@ async def process_voice_audio(
     For REST API usage when WebSocket is not available.
     Audio should be base64 encoded.
     """
-    from agents.voice_agent import get_voice_agent
-    import base64
-    
     voice_agent = get_voice_agent()
     
     try:
@@ -538,23 +597,66 @@ async def process_voice_audio(
     return result
 
 
+@app.post("/api/voice/audio/binary")
+async def process_voice_audio_binary(session_id: str, request: Request):
+    """
+    Process raw audio sent as the request body
+    
+    Same as /api/voice/audio without the base64 round trip: the body is the
+    audio clip itself and its Content-Type header is used as the MIME type.
+    """
+    voice_agent = get_voice_agent()
+    
+    audio_data = await request.body()
+    if not audio_data:
+        raise HTTPException(status_code=400, detail="Empty audio body")
+    mime_type = request.headers.get("content-type", "audio/wav")
+    
+    result = await voice_agent.process_audio(session_id, audio_data, mime_type)
+    
+    if not result.get("success"):
+        raise HTTPException(status_code=400, detail=result.get("error", "Processing failed"))
+    
+    return result
+
+
+@app.post("/api/voice/speak")
+async def speak_voice(request: VoiceSpeakRequest):
+    """
+    Stream synthesized speech for text
+    
+    Audio bytes are forwarded as Deepgram produces them, so clients can
+    start playback before synthesis finishes.
+    """
+    voice_agent = get_voice_agent()
+    
+    if not voice_agent.get_session(request.session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    if not voice_agent.deepgram:
+        raise HTTPException(status_code=503, detail="Deepgram not configured")
+    
+    return StreamingResponse(
+        voice_agent.speak_stream(request.session_id, request.text),
+        media_type=voice_agent.deepgram.tts_content_type
+    )
+
+
 @app.get("/api/voice/session/{session_id}")
 async def get_voice_session(session_id: str):
     """Get voice session info and state"""
     
-    if session_id not in sessions:
+    session = sessions.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    session = sessions[session_id]
-    
     return {
         "success": True,
         "session_id": session_id,
-        "channel": session.get("channel"),
-        "mood": session.get("mood"),
-        "language": session.get("language"),
-        "cart_items": len(session.get("cart", [])),
-        "message_count": len(session.get("conversation_history", []))
+        "channel": session["channel"],
+        "mood": session["mood"],
+        "language": session["language"],
+        "cart_items": len(session["cart"]),
+        "message_count": len(session["conversation_history"])
     }
 
 
@@ -562,16 +664,21 @@ async def get_voice_session(session_id: str):
 # ERROR HANDLERS
 # =============================================================================
 
+# The 500 body never changes, so it is serialized once at import
+_INTERNAL_ERROR_BODY = json.dumps({
+    "success": False,
+    "error": "Internal server error",
+    "message": "Something went wrong. Please try again."
+}).encode("utf-8")
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Unhandled exception: {exc}", exc_info=True)
-    return JSONResponse(
+    logger.error("Unhandled exception: %s", exc, exc_info=True)
+    return Response(
+        content=_INTERNAL_ERROR_BODY,
         status_code=500,
-        content={
-            "success": False,
-            "error": "Internal server error",
-            "message": "Something went wrong. Please try again."
-        }
+        media_type="application/json"
     )
 
 
@@ -594,4 +701,6 @@ if __name__ == "__main__":
     print("   • Payment Agent")
     print("\n" + "=" * 60 + "\n")
     
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Voice WS frames are small JSON or already-compressed audio; per-connection
+    # deflate state costs memory and CPU for no gain
+    uvicorn.run(app, host="0.0.0.0", port=8000, ws_per_message_deflate=False)
@@ -2,6 +2,8 @@
 Configuration settings for the Agentic AI Retail System
 """
 import os
+import sys
+from types import MappingProxyType
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,21 +14,30 @@ load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_BASE_URL = "https://api.groq.com/openai/v1"
 
+
+def _frozen(mapping: dict) -> MappingProxyType:
+    """Read-only view of a lookup table with interned string values"""
+    return MappingProxyType({
+        k: sys.intern(v) if isinstance(v, str) else v
+        for k, v in mapping.items()
+    })
+
+
 # Available Groq Models (Updated Dec 2025)
-GROQ_MODELS = {
+GROQ_MODELS = _frozen({
     "fast": "llama-3.1-8b-instant",      # Fast, good for simple tasks
     "balanced": "llama-3.3-70b-versatile", # Balanced performance
     "smart": "llama-3.3-70b-versatile",   # Latest, best quality
     "mixtral": "mixtral-8x7b-32768",      # Good for complex reasoning
-}
+})
 
 # Default model for each agent type
-AGENT_MODELS = {
+AGENT_MODELS = _frozen({
     "orchestrator": "llama-3.3-70b-versatile",  # Smart routing decisions
     "recommendation": "llama-3.3-70b-versatile", # Product recommendations
     "inventory": "llama-3.1-8b-instant",         # Fast stock checks
     "payment": "llama-3.1-8b-instant",           # Fast payment processing
-}
+})
 
 # =============================================================================
 # SUPABASE CONFIGURATION
@@ -62,6 +73,57 @@ DEBUG = os.getenv("DEBUG", "true").lower() == "true"
 # Session settings
 SESSION_TIMEOUT_MINUTES = 30
 MAX_CONVERSATION_HISTORY = 20
+# In-process API session store: least recently used sessions are evicted past this
+MAX_ACTIVE_SESSIONS = int(os.getenv("MAX_ACTIVE_SESSIONS", "10000"))
+
+# Use random 128-bit handoff message IDs instead of the cheaper process-local counter
+# (only needed if IDs leave the process and must be globally unique on their own)
+AGENT_MESSAGE_UUID_IDS = os.getenv("AGENT_MESSAGE_UUID_IDS", "false").lower() == "true"
+
+# JSONL audit trail of agent handoffs, written off the hot path (off unless a
+# file path is set; the file is appended to without rotation)
+AGENT_AUDIT_LOG = os.getenv("AGENT_AUDIT_LOG", "")
+
+# =============================================================================
+# SEMANTIC CACHE (language / mood / intent analysis)
+# =============================================================================
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_MAX_ENTRIES = 512
+SEMANTIC_CACHE_TTL_SECONDS = 600
+
+# Minimum cosine similarity for a near-repeat phrasing to reuse a cached result.
+# 1.0 means exact repeats only (after lowercasing and stripping punctuation).
+# Language is unscoped and translations share product names and numbers
+# ("precio del iPhone 15" vs "price of iPhone 15"), so it needs a near-exact repeat.
+# Intent carries entities ("running shoes" vs "running socks") and mood flips on
+# a negation ("happy" vs "not happy"); neither survives a nearest-neighbour match.
+SEMANTIC_CACHE_THRESHOLDS = {
+    "language": 0.95,
+    "mood": 1.0,
+    "intent": 1.0,
+}
+
+# =============================================================================
+# LLM MICRO-BATCHING (concurrent sessions)
+# =============================================================================
+LLM_BATCH_ENABLED = os.getenv("LLM_BATCH_ENABLED", "true").lower() == "true"
+LLM_BATCH_MAX_SIZE = 16      # Flush once this many calls are queued
+LLM_BATCH_MAX_WAIT_MS = 10   # ...or once the oldest call has waited this long
+
+# =============================================================================
+# PRODUCT QUERY CACHE
+# =============================================================================
+PRODUCT_CACHE_MAX_ENTRIES = 4096
+PRODUCT_CACHE_TTL_SECONDS = 60
+# Category list changes only when the catalog does
+CATEGORY_CACHE_TTL_SECONDS = 300
+# Stock levels are cached briefly for browsing; checkout always reads fresh
+STOCK_CACHE_TTL_SECONDS = 10
+
+# In-memory similarity index used for free-text product lookup
+PRODUCT_INDEX_MAX_PRODUCTS = 10000
+PRODUCT_INDEX_REFRESH_SECONDS = 300
+PRODUCT_INDEX_MIN_SCORE = 0.15
 
 # =============================================================================
 # SUPPORTED LANGUAGES
@@ -81,13 +143,13 @@ DEFAULT_LANGUAGE = "en"
 # =============================================================================
 # MOOD CATEGORIES
 # =============================================================================
-MOOD_CATEGORIES = {
-    "happy": {"emoji": "😊", "priority": 1, "response_tone": "enthusiastic"},
-    "neutral": {"emoji": "😐", "priority": 2, "response_tone": "professional"},
-    "confused": {"emoji": "😕", "priority": 2, "response_tone": "helpful"},
-    "frustrated": {"emoji": "😤", "priority": 3, "response_tone": "empathetic"},
-    "angry": {"emoji": "😠", "priority": 4, "response_tone": "calm_supportive"},
-}
+MOOD_CATEGORIES = MappingProxyType({
+    "happy": _frozen({"emoji": "😊", "priority": 1, "response_tone": "enthusiastic"}),
+    "neutral": _frozen({"emoji": "😐", "priority": 2, "response_tone": "professional"}),
+    "confused": _frozen({"emoji": "😕", "priority": 2, "response_tone": "helpful"}),
+    "frustrated": _frozen({"emoji": "😤", "priority": 3, "response_tone": "empathetic"}),
+    "angry": _frozen({"emoji": "😠", "priority": 4, "response_tone": "calm_supportive"}),
+})
 
 # =============================================================================
 # INTENT CATEGORIES (for routing)
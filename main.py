@@ -45,7 +45,9 @@ def run_api():
     print("🎤 Voice WS: ws://localhost:8000/ws/voice/{session_id}")
     print("\nPress Ctrl+C to stop\n")
     
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Voice WS frames are small JSON or already-compressed audio; per-connection
+    # deflate state costs memory and CPU for no gain
+    uvicorn.run(app, host="0.0.0.0", port=8000, ws_per_message_deflate=False)
 
 
 def run_voice():
@@ -56,21 +58,35 @@ def run_voice():
 
 async def run_console():
     """Run interactive console mode for testing"""
-    from agents import orchestrator, AgentMessage, AgentType
-    import uuid
+    from agents import (
+        orchestrator,
+        bootstrap_agents,
+        AgentMessage,
+        AgentType,
+        new_context_summary,
+        new_conversation_history,
+        history_snapshot,
+        context_summary_line,
+        Turn
+    )
+    from agents.base_agent import new_message_id
+    import secrets
+    
+    await bootstrap_agents()
     
     print("\n💬 Interactive Console Mode")
     print("Type your message and press Enter. Type 'quit' to exit.\n")
     
     # Create session context
     context = {
-        "session_id": str(uuid.uuid4()),
+        "session_id": secrets.token_hex(16),
         "user_id": "console_user",
         "channel": "console",
         "language": "auto",
         "mood": "neutral",
         "cart": [],
-        "conversation_history": []
+        "conversation_history": new_conversation_history(),
+        "context_summary": new_context_summary()
     }
     
     while True:
@@ -85,19 +101,17 @@ async def run_console():
                 break
             
             # Add to history
-            context["conversation_history"].append({
-                "role": "user",
-                "content": user_input
-            })
+            context["conversation_history"].append(Turn.now("user", user_input))
+            context["context_summary"].append(context_summary_line("user", user_input))
             
             # Process through orchestrator
             message = AgentMessage(
-                message_id=str(uuid.uuid4()),
+                message_id=new_message_id(),
                 from_agent=AgentType.ORCHESTRATOR,
                 to_agent=AgentType.ORCHESTRATOR,
                 intent="process_input",
                 payload={"user_message": user_input},
-                context=context
+                context={**context, "conversation_history": history_snapshot(context["conversation_history"])}
             )
             
             response = await orchestrator.process(message)
@@ -105,28 +119,19 @@ async def run_console():
             # Update context
             mood_data = response.data.get("mood")
             if mood_data:
-                if isinstance(mood_data, dict):
-                    context["mood"] = mood_data.get("mood", "neutral")
-                else:
-                    context["mood"] = mood_data
+                context["mood"] = mood_data.get("mood", "neutral")
             if response.data.get("language"):
                 context["language"] = response.data["language"]
             
-            context["conversation_history"].append({
-                "role": "assistant",
-                "content": response.message
-            })
+            context["conversation_history"].append(Turn.now("assistant", response.message))
+            context["context_summary"].append(context_summary_line("assistant", response.message))
             
             # Display response
             print(f"\n🤖 Assistant: {response.message}")
             
             # Show debug info
-            mood_data = response.data.get("mood")
             if mood_data:
-                if isinstance(mood_data, dict):
-                    print(f"   📊 Mood: {mood_data.get('mood')} ({mood_data.get('confidence', 0):.0%})")
-                else:
-                    print(f"   📊 Mood: {mood_data}")
+                print(f"   📊 Mood: {mood_data.get('mood')} ({mood_data.get('confidence', 0):.0%})")
             intent_data = response.data.get("intent")
             if intent_data:
                 if isinstance(intent_data, dict):
@@ -4,12 +4,35 @@ Handles all database operations for products, inventory, orders, and sessions
 """
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from supabase import create_client, Client
-from config import SUPABASE_URL, SUPABASE_KEY
+from config import (
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    PRODUCT_CACHE_MAX_ENTRIES,
+    PRODUCT_CACHE_TTL_SECONDS,
+    CATEGORY_CACHE_TTL_SECONDS,
+    STOCK_CACHE_TTL_SECONDS,
+    MAX_CONVERSATION_HISTORY
+)
+from services.timestamps import now_iso
+from services.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Product list results, keyed by ("all", limit), ("search", query, category) or ("category", category)
+product_query_cache = TTLCache(PRODUCT_CACHE_MAX_ENTRIES, PRODUCT_CACHE_TTL_SECONDS)
+
+# Single products and stock statuses, keyed by str(product_id)
+product_cache = TTLCache(PRODUCT_CACHE_MAX_ENTRIES, PRODUCT_CACHE_TTL_SECONDS)
+stock_cache = TTLCache(PRODUCT_CACHE_MAX_ENTRIES, STOCK_CACHE_TTL_SECONDS)
+
+# Sorted category names (single entry)
+category_cache = TTLCache(1, CATEGORY_CACHE_TTL_SECONDS)
+
+# Compare-and-set retries for a single inventory update under contention
+_INVENTORY_UPDATE_ATTEMPTS = 3
+
 # Initialize Supabase client
 supabase: Client = None
 
@@ -33,9 +56,15 @@ class DatabaseService:
     @staticmethod
     def get_all_products(limit: int = 50) -> List[Dict]:
         """Get all products from catalog"""
+        cache_key = ("all", limit)
+        cached = product_query_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             db = get_supabase()
             response = db.table("products").select("*").limit(limit).execute()
+            product_query_cache.set(cache_key, response.data)
             return response.data
         except Exception as e:
             logger.error(f"Error fetching products: {e}")
@@ -44,24 +73,53 @@ class DatabaseService:
     @staticmethod
     def get_product_by_id(product_id: str) -> Optional[Dict]:
         """Get single product by ID"""
+        cached = product_cache.get(str(product_id))
+        if cached is not None:
+            return cached
+        
         try:
             db = get_supabase()
             response = db.table("products").select("*").eq("id", product_id).single().execute()
+            if response.data:
+                product_cache.set(str(product_id), response.data)
             return response.data
         except Exception as e:
             logger.error(f"Error fetching product {product_id}: {e}")
             return None
     
+    @staticmethod
+    def get_products_by_ids(product_ids: List[str]) -> List[Dict]:
+        """Get several products in one query, preserving the order of product_ids"""
+        if not product_ids:
+            return []
+        try:
+            db = get_supabase()
+            response = db.table("products").select("*").in_("id", list(product_ids)).execute()
+            by_id = {str(p["id"]): p for p in response.data}
+            return [by_id[str(pid)] for pid in product_ids if str(pid) in by_id]
+        except Exception as e:
+            logger.error(f"Error fetching products {product_ids}: {e}")
+            return []
+    
     @staticmethod
     def search_products(query: str, category: Optional[str] = None) -> List[Dict]:
         """Search products by name or description"""
+        # ilike is case-insensitive, so normalising the key doesn't change results
+        query = (query or "").strip()
+        cache_key = ("search", query.lower(), category)
+        cached = product_query_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             db = get_supabase()
-            # Use ilike for case-insensitive search
+            # Use ilike for case-insensitive search; the pg_trgm index on
+            # products.name (see DEPLOYMENT_GUIDE.md) keeps this off a seq scan
             q = db.table("products").select("*").ilike("name", f"%{query}%")
             if category:
                 q = q.eq("category", category)
             response = q.execute()
+            product_query_cache.set(cache_key, response.data)
             return response.data
         except Exception as e:
             logger.error(f"Error searching products: {e}")
@@ -70,22 +128,45 @@ class DatabaseService:
     @staticmethod
     def get_products_by_category(category: str) -> List[Dict]:
         """Get products by category"""
+        cache_key = ("category", category)
+        cached = product_query_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             db = get_supabase()
             response = db.table("products").select("*").eq("category", category).execute()
+            product_query_cache.set(cache_key, response.data)
             return response.data
         except Exception as e:
             logger.error(f"Error fetching category {category}: {e}")
             return []
     
+    @staticmethod
+    def invalidate_product(product_id: str):
+        """
+        Drop the cached product and stock entries for product_id
+        
+        Cached product lists hold catalog rows without stock, so inventory
+        changes leave them alone; they expire on their own TTL.
+        """
+        product_id = str(product_id)
+        product_cache.pop(product_id)
+        stock_cache.pop(product_id)
+    
     @staticmethod
     def get_categories() -> List[str]:
         """Get all unique product categories"""
+        cached = category_cache.get("categories")
+        if cached is not None:
+            return cached
+        
         try:
             db = get_supabase()
             response = db.table("products").select("category").execute()
-            categories = list(set([p["category"] for p in response.data if p.get("category")]))
-            return sorted(categories)
+            categories = sorted({p["category"] for p in response.data if p.get("category")})
+            category_cache.set("categories", categories)
+            return categories
         except Exception as e:
             logger.error(f"Error fetching categories: {e}")
             return []
@@ -105,47 +186,163 @@ class DatabaseService:
             logger.error(f"Error fetching inventory for {product_id}: {e}")
             return None
     
+    @staticmethod
+    def _stock_status(inventory: Optional[Dict]) -> Dict:
+        """Build a stock status dict from an inventory row"""
+        if not inventory:
+            return {"in_stock": False, "quantity": 0, "status": "not_found"}
+        
+        quantity = inventory.get("quantity", 0)
+        return {
+            "in_stock": quantity > 0,
+            "quantity": quantity,
+            "status": "available" if quantity > 0 else "out_of_stock",
+            "low_stock": quantity > 0 and quantity <= 5
+        }
+    
     @staticmethod
     def check_stock(product_id: str) -> Dict:
         """Check if product is in stock and quantity available"""
+        cached = stock_cache.get(str(product_id))
+        if cached is not None:
+            return cached
+        
         try:
             inventory = DatabaseService.get_inventory(product_id)
-            if not inventory:
-                return {"in_stock": False, "quantity": 0, "status": "not_found"}
-            
-            quantity = inventory.get("quantity", 0)
-            return {
-                "in_stock": quantity > 0,
-                "quantity": quantity,
-                "status": "available" if quantity > 0 else "out_of_stock",
-                "low_stock": quantity > 0 and quantity <= 5
-            }
+            status = DatabaseService._stock_status(inventory)
+            # A missing row may be a transient lookup failure; don't pin it
+            if inventory:
+                stock_cache.set(str(product_id), status)
+            return status
         except Exception as e:
             logger.error(f"Error checking stock: {e}")
             return {"in_stock": False, "quantity": 0, "status": "error"}
     
+    @staticmethod
+    def check_stock_bulk(product_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Check stock for many products with a single query
+        
+        Returns:
+            Dict of str(product_id) -> stock status (same shape as check_stock)
+        """
+        if not product_ids:
+            return {}
+        try:
+            db = get_supabase()
+            response = db.table("inventory").select("*").in_("product_id", list(product_ids)).execute()
+            rows = {str(row["product_id"]): row for row in response.data}
+            return {
+                str(pid): DatabaseService._stock_status(rows.get(str(pid)))
+                for pid in product_ids
+            }
+        except Exception as e:
+            logger.error(f"Error checking stock in bulk: {e}")
+            return {
+                str(pid): {"in_stock": False, "quantity": 0, "status": "error"}
+                for pid in product_ids
+            }
+    
     @staticmethod
     def update_inventory(product_id: str, quantity_change: int) -> bool:
-        """Update inventory quantity (negative for reduction)"""
+        """
+        Update inventory quantity (negative for reduction)
+        
+        The write only applies if the quantity is still the one that was read,
+        so two concurrent updates cannot both start from the same stock level;
+        the loser re-reads and retries. Checkout uses update_inventory_bulk,
+        which applies the same compare-and-set to every cart line.
+        """
         try:
             db = get_supabase()
-            # Get current inventory
-            current = DatabaseService.get_inventory(product_id)
-            if not current:
-                return False
-            
-            new_quantity = max(0, current.get("quantity", 0) + quantity_change)
-            
-            db.table("inventory").update({
-                "quantity": new_quantity,
-                "updated_at": datetime.utcnow().isoformat()
-            }).eq("product_id", product_id).execute()
+            for _ in range(_INVENTORY_UPDATE_ATTEMPTS):
+                current = DatabaseService.get_inventory(product_id)
+                if not current:
+                    return False
+                
+                quantity = current.get("quantity", 0)
+                if DatabaseService._set_quantity_if_unchanged(
+                    db, product_id, quantity, max(0, quantity + quantity_change)
+                ):
+                    DatabaseService.invalidate_product(product_id)
+                    return True
             
-            return True
+            logger.warning("Inventory for %s kept changing; update abandoned", product_id)
+            DatabaseService.invalidate_product(product_id)
+            return False
         except Exception as e:
             logger.error(f"Error updating inventory: {e}")
             return False
     
+    @staticmethod
+    def update_inventory_bulk(quantity_changes: List[Tuple[str, int]]) -> bool:
+        """
+        Apply several inventory changes, all or nothing
+        
+        Rows are read in one query, then each is written only if its quantity
+        is still the one that was read, so concurrent checkouts cannot lose
+        each other's decrements; rows that changed in between are re-read and
+        retried. A missing row, a change that would take stock below zero or
+        a row that keeps changing fails the batch, and the changes already
+        applied are reverted.
+        
+        Args:
+            quantity_changes: (product_id, quantity_change) pairs; negative for reduction
+        """
+        if not quantity_changes:
+            return True
+        
+        changes: Dict[str, int] = {}
+        for product_id, quantity_change in quantity_changes:
+            changes[str(product_id)] = changes.get(str(product_id), 0) + quantity_change
+        
+        applied: Dict[str, int] = {}
+        try:
+            db = get_supabase()
+            if DatabaseService._apply_inventory_changes(db, changes, applied):
+                return True
+            
+            if applied and not DatabaseService._apply_inventory_changes(
+                db, {pid: -change for pid, change in applied.items()}, {}
+            ):
+                logger.error("Could not revert partial inventory update %s", applied)
+            return False
+        except Exception as e:
+            logger.error("Error updating inventory in bulk: %s (applied: %s)", e, applied)
+            return False
+        finally:
+            for product_id in changes:
+                DatabaseService.invalidate_product(product_id)
+    
+    @staticmethod
+    def _apply_inventory_changes(db: Client, changes: Dict[str, int], applied: Dict[str, int]) -> bool:
+        """Compare-and-set each change, recording successful ones in applied"""
+        pending = dict(changes)
+        for _ in range(_INVENTORY_UPDATE_ATTEMPTS):
+            response = db.table("inventory").select("product_id, quantity").in_("product_id", list(pending)).execute()
+            current = {str(row["product_id"]): row.get("quantity", 0) for row in response.data}
+            
+            for product_id, change in list(pending.items()):
+                quantity = current.get(product_id)
+                if quantity is None or quantity + change < 0:
+                    return False
+                if DatabaseService._set_quantity_if_unchanged(db, product_id, quantity, quantity + change):
+                    applied[product_id] = change
+                    del pending[product_id]
+            
+            if not pending:
+                return True
+        return False
+    
+    @staticmethod
+    def _set_quantity_if_unchanged(db: Client, product_id: str, expected: int, quantity: int) -> bool:
+        """Write quantity only while the stored value is still expected"""
+        response = db.table("inventory").update({
+            "quantity": quantity,
+            "updated_at": datetime.utcnow().isoformat()
+        }).eq("product_id", product_id).eq("quantity", expected).execute()
+        return bool(response.data)
+    
     @staticmethod
     def get_low_stock_products(threshold: int = 5) -> List[Dict]:
         """Get products with low stock"""
@@ -246,8 +443,8 @@ class DatabaseService:
                 "context": {},
                 "conversation_history": [],
                 "cart": [],
-                "created_at": datetime.utcnow().isoformat(),
-                "last_activity": datetime.utcnow().isoformat()
+                "created_at": now_iso(),
+                "last_activity": now_iso()
             }
             
             response = db.table("sessions").insert(session_data).execute()
@@ -275,7 +472,7 @@ class DatabaseService:
         """Update session data"""
         try:
             db = get_supabase()
-            updates["last_activity"] = datetime.utcnow().isoformat()
+            updates["last_activity"] = now_iso()
             db.table("sessions").update(updates).eq("id", session_id).execute()
             return True
         except Exception as e:
@@ -297,9 +494,8 @@ class DatabaseService:
                 "timestamp": datetime.utcnow().isoformat()
             })
             
-            # Keep only last N messages
-            from config import MAX_CONVERSATION_HISTORY
-            history = history[-MAX_CONVERSATION_HISTORY:]
+            # Keep only last N messages (trimmed in place, no copy)
+            del history[:-MAX_CONVERSATION_HISTORY]
             
             return DatabaseService.update_session(session_id, {"conversation_history": history})
         except Exception as e:
@@ -353,6 +549,23 @@ class DatabaseService:
             logger.error(f"Error getting cart: {e}")
             return []
     
+    @staticmethod
+    def checkout_snapshot(session_id: str) -> Dict:
+        """
+        Get the cart together with current stock for every line
+        
+        Cart lines live on the session row, so this is two queries (session
+        + one bulk inventory lookup) however many items are in the cart.
+        
+        Returns:
+            {"items": cart items, "stock": str(product_id) -> stock status}
+        """
+        cart = DatabaseService.get_cart(session_id)
+        if not cart:
+            return {"items": [], "stock": {}}
+        stock = DatabaseService.check_stock_bulk([item.get("product_id") for item in cart])
+        return {"items": cart, "stock": stock}
+    
     @staticmethod
     def clear_cart(session_id: str) -> bool:
         """Clear cart"""
@@ -368,15 +581,35 @@ class DatabaseService:
         try:
             db = get_supabase()
             
-            products_count = len(db.table("products").select("id").execute().data)
-            orders_count = len(db.table("orders").select("id").execute().data)
-            sessions_count = len(db.table("sessions").select("id").execute().data)
+            # Server-side COUNT(*) with no rows in the response body
+            def count(table: str) -> int:
+                return db.table(table).select("id", count="exact", head=True).execute().count or 0
+            
+            products_count = count("products")
+            orders_count = count("orders")
+            sessions_count = count("sessions")
             
             return {
                 "total_products": products_count,
                 "total_orders": orders_count,
-                "active_sessions": sessions_count
+                "active_sessions": sessions_count,
+                "cache": DatabaseService.cache_stats()
             }
         except Exception as e:
             logger.error(f"Error getting stats: {e}")
-            return {"total_products": 0, "total_orders": 0, "active_sessions": 0}
+            return {
+                "total_products": 0,
+                "total_orders": 0,
+                "active_sessions": 0,
+                "cache": DatabaseService.cache_stats()
+            }
+    
+    @staticmethod
+    def cache_stats() -> Dict[str, Dict]:
+        """Hit/miss counters of the in-process read caches"""
+        return {
+            "product_queries": product_query_cache.stats(),
+            "products": product_cache.stats(),
+            "stock": stock_cache.stats(),
+            "categories": category_cache.stats()
+        }
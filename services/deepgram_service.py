@@ -4,9 +4,10 @@ Provides real-time STT (Speech-to-Text) and TTS (Text-to-Speech)
 """
 import asyncio
 import base64
+import importlib.util
 import json
 import logging
-from typing import Optional, Callable, Dict, Any
+from typing import AsyncIterator, Optional, Callable, Dict, Any
 from dataclasses import dataclass
 from enum import Enum
 
@@ -44,6 +45,26 @@ class DeepgramConfig:
     tts_voice: DeepgramVoice = DeepgramVoice.ASTERIA
     tts_sample_rate: int = 24000     # 24kHz for good quality
     tts_encoding: str = "linear16"   # PCM audio
+    tts_container: str = "none"      # Raw PCM, no WAV header to parse
+    # Streamed PCM is emitted in growing chunks: small first frame, then larger
+    tts_first_chunk_ms: int = 20
+    tts_max_chunk_ms: int = 200
+    # Shared REST connection pool: bounds concurrent Deepgram requests and
+    # keeps TLS connections alive between turns
+    max_connections: int = 32
+    max_keepalive_connections: int = 16
+    request_timeout: float = 30.0
+
+
+# HTTP/2 lets concurrent requests share one connection; httpx needs h2 for it
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Named TTS output formats: name -> (encoding, container)
+TTS_FORMATS = {
+    "pcm": ("linear16", "none"),
+    "wav": ("linear16", "wav"),
+    "opus": ("opus", "ogg"),
+}
 
 
 class DeepgramService:
@@ -64,9 +85,38 @@ class DeepgramService:
         self.config = config
         self.base_url = "https://api.deepgram.com/v1"
         self._ws_connection = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self.tts_content_type = self._tts_request(config.tts_voice)[1]
         
         logger.info(f"DeepgramService initialized with model: {config.stt_model}")
     
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        Shared HTTP client for the REST endpoints (created on first use)
+        
+        Requests beyond max_connections wait for a free pooled connection
+        instead of opening new sockets, so a traffic spike can't exhaust
+        file descriptors or trigger a burst of TLS handshakes. HTTP/2 is
+        used when the optional h2 package is installed.
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=_HTTP2_AVAILABLE,
+                timeout=self.config.request_timeout,
+                limits=httpx.Limits(
+                    max_connections=self.config.max_connections,
+                    max_keepalive_connections=self.config.max_keepalive_connections
+                )
+            )
+        return self._client
+    
+    async def aclose(self):
+        """Close the shared HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
     # =========================================================================
     # SPEECH-TO-TEXT (STT)
     # =========================================================================
@@ -97,35 +147,34 @@ class DeepgramService:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    url,
-                    params=params,
-                    headers=headers,
-                    content=audio_data
-                )
-                response.raise_for_status()
-                
-                result = response.json()
-                
-                # Extract transcript from response
-                channels = result.get("results", {}).get("channels", [])
-                if channels:
-                    alternatives = channels[0].get("alternatives", [])
-                    if alternatives:
-                        return {
-                            "success": True,
-                            "transcript": alternatives[0].get("transcript", ""),
-                            "confidence": alternatives[0].get("confidence", 0.0),
-                            "words": alternatives[0].get("words", []),
-                            "raw_response": result
-                        }
-                
-                return {
-                    "success": False,
-                    "transcript": "",
-                    "error": "No transcription in response"
-                }
+            response = await self.client.post(
+                url,
+                params=params,
+                headers=headers,
+                content=audio_data
+            )
+            response.raise_for_status()
+            
+            result = response.json()
+            
+            # Extract transcript from response
+            channels = result.get("results", {}).get("channels", [])
+            if channels:
+                alternatives = channels[0].get("alternatives", [])
+                if alternatives:
+                    return {
+                        "success": True,
+                        "transcript": alternatives[0].get("transcript", ""),
+                        "confidence": alternatives[0].get("confidence", 0.0),
+                        "words": alternatives[0].get("words", []),
+                        "raw_response": result
+                    }
+            
+            return {
+                "success": False,
+                "transcript": "",
+                "error": "No transcription in response"
+            }
                 
         except httpx.HTTPStatusError as e:
             logger.error(f"Deepgram STT HTTP error: {e.response.status_code}")
@@ -164,10 +213,43 @@ class DeepgramService:
     # TEXT-TO-SPEECH (TTS)
     # =========================================================================
     
+    def _tts_request(self, voice: DeepgramVoice, audio_format: str = None):
+        """
+        Build TTS query params and the resulting content type
+        
+        Args:
+            voice: Voice to use
+            audio_format: Name from TTS_FORMATS (default from config)
+        """
+        if audio_format:
+            encoding, container = TTS_FORMATS[audio_format]
+        else:
+            encoding, container = self.config.tts_encoding, self.config.tts_container
+        
+        params = {
+            "model": voice.value,
+            "encoding": encoding,
+            "container": container,
+        }
+        if encoding == "linear16":
+            params["sample_rate"] = self.config.tts_sample_rate
+        
+        if encoding == "linear16" and container == "none":
+            content_type = f"audio/pcm;rate={self.config.tts_sample_rate};channels=1"
+        elif container == "wav":
+            content_type = "audio/wav"
+        elif container == "ogg":
+            content_type = "audio/ogg"
+        else:
+            content_type = f"audio/{encoding}"
+        
+        return params, content_type
+    
     async def synthesize_speech(
         self, 
         text: str, 
-        voice: DeepgramVoice = None
+        voice: DeepgramVoice = None,
+        audio_format: str = None
     ) -> Dict[str, Any]:
         """
         Convert text to speech audio
@@ -175,6 +257,7 @@ class DeepgramService:
         Args:
             text: Text to synthesize
             voice: Voice to use (default from config)
+            audio_format: "pcm", "wav" or "opus" (default from config: raw PCM)
             
         Returns:
             Dict with 'audio' (bytes), 'content_type', etc.
@@ -182,11 +265,7 @@ class DeepgramService:
         voice = voice or self.config.tts_voice
         url = f"{self.base_url}/speak"
         
-        params = {
-            "model": voice.value,
-            "encoding": self.config.tts_encoding,
-            "sample_rate": self.config.tts_sample_rate,
-        }
+        params, content_type = self._tts_request(voice, audio_format)
         
         headers = {
             "Authorization": f"Token {self.config.api_key}",
@@ -194,22 +273,21 @@ class DeepgramService:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    url,
-                    params=params,
-                    headers=headers,
-                    json={"text": text}
-                )
-                response.raise_for_status()
-                
-                return {
-                    "success": True,
-                    "audio": response.content,
-                    "content_type": response.headers.get("content-type", "audio/wav"),
-                    "sample_rate": self.config.tts_sample_rate,
-                    "encoding": self.config.tts_encoding
-                }
+            response = await self.client.post(
+                url,
+                params=params,
+                headers=headers,
+                json={"text": text}
+            )
+            response.raise_for_status()
+            
+            return {
+                "success": True,
+                "audio": response.content,
+                "content_type": content_type,
+                "sample_rate": params.get("sample_rate"),
+                "encoding": params["encoding"]
+            }
                 
         except httpx.HTTPStatusError as e:
             logger.error(f"Deepgram TTS HTTP error: {e.response.status_code}")
@@ -226,16 +304,95 @@ class DeepgramService:
                 "error": str(e)
             }
     
+    async def synthesize_speech_stream(
+        self,
+        text: str,
+        voice: DeepgramVoice = None,
+        chunk_size: int = None,
+        audio_format: str = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Convert text to speech, yielding audio bytes as Deepgram produces them
+        
+        Unlike synthesize_speech, nothing is buffered: the first chunk can be
+        played (or forwarded) while the rest of the audio is still arriving.
+        On error the stream simply ends; the error is logged.
+        
+        Without chunk_size, linear16 audio is chunked progressively (see
+        _progressive_chunks); other encodings use 4096-byte chunks.
+        """
+        voice = voice or self.config.tts_voice
+        url = f"{self.base_url}/speak"
+        
+        params, _ = self._tts_request(voice, audio_format)
+        progressive = chunk_size is None and params["encoding"] == "linear16"
+        
+        headers = {
+            "Authorization": f"Token {self.config.api_key}",
+            "Content-Type": "application/json",
+        }
+        
+        try:
+            async with self.client.stream(
+                "POST",
+                url,
+                params=params,
+                headers=headers,
+                json={"text": text}
+            ) as response:
+                if response.is_error:
+                    await response.aread()
+                    logger.error(f"Deepgram TTS HTTP error: {response.status_code} {response.text}")
+                    return
+                
+                if progressive:
+                    chunks = self._progressive_chunks(response.aiter_bytes())
+                else:
+                    chunks = response.aiter_bytes(chunk_size or 4096)
+                
+                async for chunk in chunks:
+                    yield chunk
+                        
+        except httpx.HTTPError as e:
+            logger.error(f"Deepgram TTS stream error: {e}")
+    
+    async def _progressive_chunks(self, source: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """
+        Re-chunk a linear16 byte stream into frames of growing duration
+        
+        The first frame is tts_first_chunk_ms long so playback can start as
+        soon as possible; each following frame doubles up to tts_max_chunk_ms
+        to keep per-frame overhead low. Whatever is left at the end of the
+        stream is flushed as a short final frame.
+        """
+        bytes_per_ms = self.config.tts_sample_rate * 2 // 1000  # 16-bit mono
+        chunk_ms = self.config.tts_first_chunk_ms
+        max_ms = self.config.tts_max_chunk_ms
+        buffer = bytearray()
+        
+        async for data in source:
+            buffer += data
+            target = chunk_ms * bytes_per_ms
+            while len(buffer) >= target:
+                yield bytes(buffer[:target])
+                del buffer[:target]
+                chunk_ms = min(chunk_ms * 2, max_ms)
+                target = chunk_ms * bytes_per_ms
+        
+        if buffer:
+            yield bytes(buffer)
+    
     async def synthesize_speech_base64(
         self, 
         text: str, 
-        voice: DeepgramVoice = None
+        voice: DeepgramVoice = None,
+        audio_format: str = None
     ) -> Dict[str, Any]:
         """
         Convert text to base64-encoded speech audio
         Useful for sending audio over JSON/WebSocket
         """
-        result = await self.synthesize_speech(text, voice)
+        result = await self.synthesize_speech(text, voice, audio_format)
         
         if result["success"] and result["audio"]:
             result["audio_base64"] = base64.b64encode(result["audio"]).decode("utf-8")
@@ -294,7 +451,7 @@ class DeepgramStreamingSTT:
             
             headers = {"Authorization": f"Token {self.config.api_key}"}
             
-            self._ws = await websockets.connect(url, extra_headers=headers)
+            self._ws = await websockets.connect(url, additional_headers=headers)
             self._running = True
             
             # Start listening for responses
@@ -378,6 +535,113 @@ class DeepgramStreamingSTT:
                 break
 
 
+# =============================================================================
+# STREAMING TTS HANDLER
+# =============================================================================
+
+class DeepgramStreamingTTS:
+    """
+    Persistent text-to-speech WebSocket for one voice session
+    
+    Every utterance in the session reuses the same connection, so only the
+    first one pays the TCP + TLS + HTTP upgrade handshake.
+    
+    Usage:
+        tts = DeepgramStreamingTTS(config)
+        audio = await tts.synthesize("Hello!")   # raw PCM bytes or None
+        await tts.close()
+    """
+    
+    def __init__(self, config: DeepgramConfig):
+        self.config = config
+        self._ws = None
+        # One utterance at a time: audio frames aren't tagged per request
+        self._lock = asyncio.Lock()
+    
+    @property
+    def content_type(self) -> str:
+        """The socket always returns headerless linear16 audio"""
+        return f"audio/pcm;rate={self.config.tts_sample_rate};channels=1"
+    
+    async def connect(self) -> bool:
+        """Connect to Deepgram streaming TTS"""
+        try:
+            import websockets
+            
+            url = "wss://api.deepgram.com/v1/speak?" + "&".join([
+                f"model={self.config.tts_voice.value}",
+                "encoding=linear16",
+                f"sample_rate={self.config.tts_sample_rate}",
+            ])
+            headers = {"Authorization": f"Token {self.config.api_key}"}
+            
+            self._ws = await websockets.connect(url, additional_headers=headers)
+            logger.info("Connected to Deepgram streaming TTS")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to connect to Deepgram TTS: {e}")
+            self._ws = None
+            return False
+    
+    async def synthesize(self, text: str, timeout: float = 30.0) -> Optional[bytes]:
+        """
+        Synthesize text over the open connection (connecting on first use)
+        
+        Returns:
+            Raw PCM bytes, or None if the socket failed (caller should fall
+            back to the REST endpoint)
+        """
+        async with self._lock:
+            if self._ws is None and not await self.connect():
+                return None
+            
+            try:
+                await self._ws.send(json.dumps({"type": "Speak", "text": text}))
+                await self._ws.send(json.dumps({"type": "Flush"}))
+                
+                chunks = []
+                while True:
+                    message = await asyncio.wait_for(self._ws.recv(), timeout=timeout)
+                    if isinstance(message, bytes):
+                        chunks.append(message)
+                        continue
+                    
+                    data = json.loads(message)
+                    if data.get("type") == "Flushed":
+                        return b"".join(chunks)
+                    if data.get("type") in ("Warning", "Error"):
+                        logger.warning(f"Deepgram TTS: {data}")
+                        
+            except asyncio.CancelledError:
+                # The rest of this utterance is still in flight; never reuse the socket
+                await self._close_socket()
+                raise
+            except Exception as e:
+                logger.error(f"Deepgram streaming TTS error: {e}")
+                await self._close_socket()
+                return None
+    
+    async def warmup(self) -> bool:
+        """Open the connection ahead of the first synthesize() call"""
+        async with self._lock:
+            return self._ws is not None or await self.connect()
+    
+    async def close(self):
+        """Close the WebSocket connection"""
+        async with self._lock:
+            await self._close_socket()
+    
+    async def _close_socket(self):
+        if self._ws:
+            try:
+                await self._ws.send(json.dumps({"type": "Close"}))
+                await self._ws.close()
+            except Exception:
+                pass
+            self._ws = None
+
+
 # =============================================================================
 # FACTORY FUNCTIONS
 # =============================================================================
@@ -402,6 +666,12 @@ def get_deepgram_service() -> Optional[DeepgramService]:
     return _deepgram_service
 
 
+async def close_deepgram_service():
+    """Release the global service's pooled connections (app shutdown)"""
+    if _deepgram_service is not None:
+        await _deepgram_service.aclose()
+
+
 def create_deepgram_service(api_key: str, **kwargs) -> DeepgramService:
     """Create a new Deepgram service with custom config"""
     config = DeepgramConfig(api_key=api_key, **kwargs)
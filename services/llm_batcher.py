@@ -0,0 +1,169 @@
+"""
+LLM Micro-Batcher for Agentic AI Retail System
+Coalesces per-turn analysis calls (language, mood, intent) from concurrent
+sessions into a single batched LLM request
+"""
+import asyncio
+import copy
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import LLM_BATCH_ENABLED, LLM_BATCH_MAX_SIZE, LLM_BATCH_MAX_WAIT_MS
+from services.llm_service import LLMService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class PendingCall:
+    """An analysis call waiting to be batched"""
+    future: asyncio.Future
+    kind: str
+    text: str
+    context: Any
+    enqueued_at: float
+
+
+class MicroBatcher:
+    """
+    Collects analysis calls for up to max_wait_ms (or max_batch_size calls)
+    and submits each kind as one LLM request.
+
+    A batch of one falls back to the regular LLMService method, and a batch
+    whose response cannot be split back per input is retried call-by-call,
+    so batching never changes what a caller receives on failure.
+    """
+
+    def __init__(self, max_batch_size: int = LLM_BATCH_MAX_SIZE, max_wait_ms: float = LLM_BATCH_MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # In-flight dispatches; referenced until done so they aren't garbage collected
+        self._dispatches: set = set()
+
+    @staticmethod
+    def _single(kind: str):
+        return {
+            "language": LLMService.detect_language,
+            "mood": LLMService.analyze_mood,
+            "intent": LLMService.classify_intent,
+        }[kind]
+
+    @staticmethod
+    def _args(kind: str, text: str, context: Any) -> Dict[str, Any]:
+        if kind == "mood":
+            return {"text": text, "conversation_history": context}
+        if kind == "intent":
+            return {"text": text, "conversation_context": context}
+        return {"text": text}
+
+    @staticmethod
+    def _context_text(kind: str, context: Any) -> str:
+        """Render a call's context the way the single-call prompt would see it"""
+        if not context:
+            return ""
+        if kind == "mood":
+            return " | ".join(f"{m['role']}: {m['content']}" for m in context[-5:])
+        return str(context)
+
+    async def submit(self, kind: str, text: str, context: Any = None) -> Dict[str, Any]:
+        """
+        Run an analysis, batched with any concurrent calls of the same kind
+
+        Args:
+            kind: "language", "mood" or "intent"
+            text: User input
+            context: Conversation history (mood) or context summary (intent)
+        """
+        single = self._single(kind)
+        kwargs = self._args(kind, text, context)
+
+        if not LLM_BATCH_ENABLED:
+            return await asyncio.to_thread(single, **kwargs)
+
+        cached = single.lookup(**kwargs)
+        if cached is not None:
+            return cached
+
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(PendingCall(future, kind, text, context, time.monotonic()))
+        return await future
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run_loop())
+
+    async def _run_loop(self):
+        """Drain the queue into batches bounded by size and age"""
+        while True:
+            first = await self._queue.get()
+            batch = [first]
+            deadline = first.enqueued_at + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            by_kind: Dict[str, List[PendingCall]] = {}
+            for call in batch:
+                by_kind.setdefault(call.kind, []).append(call)
+
+            for kind, calls in by_kind.items():
+                task = asyncio.create_task(self._dispatch(kind, calls))
+                self._dispatches.add(task)
+                task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, kind: str, calls: List[PendingCall]):
+        """Resolve one kind's calls with a batched request (or singly)"""
+        single = self._single(kind)
+
+        # Identical inputs in the same window share one slot in the batch
+        groups: Dict[Tuple[str, str], List[PendingCall]] = {}
+        for call in calls:
+            key = (call.text.strip().lower(), self._context_text(kind, call.context))
+            groups.setdefault(key, []).append(call)
+        unique = [group[0] for group in groups.values()]
+
+        try:
+            results = None
+            if len(unique) > 1:
+                logger.debug("Batching %d %s calls (%d unique)", len(calls), kind, len(unique))
+                results = await asyncio.to_thread(
+                    LLMService.analyze_batch,
+                    kind,
+                    [{"text": c.text, "context": self._context_text(kind, c.context)} for c in unique]
+                )
+
+            if results is None:
+                results = await asyncio.gather(*[
+                    asyncio.to_thread(single, **self._args(kind, c.text, c.context))
+                    for c in unique
+                ])
+            else:
+                for call, result in zip(unique, results):
+                    single.store(result, **self._args(kind, call.text, call.context))
+
+            for group, result in zip(groups.values(), results):
+                for call in group:
+                    if not call.future.done():
+                        call.future.set_result(copy.deepcopy(result))
+
+        except Exception as e:
+            logger.error("LLM batch error (%s): %s", kind, e)
+            for call in calls:
+                if not call.future.done():
+                    call.future.set_exception(e)
+
+
+# Global batcher instance
+llm_batcher = MicroBatcher()
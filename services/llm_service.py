@@ -2,13 +2,91 @@
 Groq LLM Service for Agentic AI Retail System
 Provides LLM capabilities for all agents using Groq's fast inference
 """
+import copy
 import logging
 from typing import Dict, List, Optional, Any
 from groq import Groq
 from config import GROQ_API_KEY, GROQ_MODELS, AGENT_MODELS
+from services.semantic_cache import semantic_cached
 
 logger = logging.getLogger(__name__)
 
+# Fallback results returned when the LLM call fails (never cached)
+DEFAULT_LANGUAGE_RESULT = {"language_code": "en", "language_name": "English", "confidence": 0.5}
+DEFAULT_MOOD_RESULT = {
+    "mood": "neutral",
+    "confidence": 0.5,
+    "indicators": [],
+    "suggested_tone": "professional"
+}
+DEFAULT_INTENT_RESULT = {
+    "intent": "general_question",
+    "confidence": 0.5,
+    "entities": {},
+    "target_agent": "orchestrator"
+}
+
+
+def _earlier_messages(text: str, history: List[Dict]) -> List[Dict]:
+    """History without the trailing user message for text (the turn being analysed)"""
+    if history and history[-1].get("role") == "user" and history[-1].get("content") == text:
+        return history[:-1]
+    return history
+
+
+def _earlier_summary(text: str, summary: Optional[str]) -> str:
+    """Context summary without its trailing "user: <text>" line (see context_summary_line)"""
+    head, _, last = (summary or "").rpartition("\n")
+    if last.startswith("user: ") and text.startswith(last[len("user: "):]):
+        return head
+    return summary or ""
+
+
+# Instructions for batched analysis requests (see LLMService.analyze_batch)
+BATCH_ANALYSIS_TASKS = {
+    "language": """You are a language detection system. For each input return:
+{"language_code": "en", "language_name": "English", "confidence": 0.95}
+Use ISO 639-1 codes (en, es, fr, de, hi, zh, ar, etc.)""",
+    "mood": """You are a mood/sentiment analyzer for customer service. For each input return:
+{"mood": "happy|neutral|confused|frustrated|angry", "confidence": 0.0-1.0,
+ "indicators": ["list", "of", "mood", "indicators"],
+ "suggested_tone": "enthusiastic|professional|helpful|empathetic|calm_supportive"}""",
+    "intent": """You are an intent classifier for a retail AI system. For each input return:
+{"intent": "browse_products|search_product|get_recommendation|check_availability|check_stock|add_to_cart|view_cart|checkout|make_payment|confirm_action|track_order|general_question|greeting|farewell",
+ "confidence": 0.0-1.0,
+ "entities": {"product_name": "if mentioned", "category": "if mentioned", "quantity": "if mentioned", "price_range": "if mentioned"},
+ "target_agent": "recommendation|inventory|payment|orchestrator"}
+Use the context to resolve confirmations like "yes", "proceed" or "do it" - they are NOT greetings.""",
+}
+
+# Keys each batched result must carry (as strings) before it is used or cached
+_BATCH_REQUIRED_KEYS = {
+    "language": ("language_code",),
+    "mood": ("mood",),
+    "intent": ("intent", "target_agent"),
+}
+
+
+def _batch_results(kind: str, response: str, count: int) -> Optional[List[Dict[str, Any]]]:
+    """Parse a batched response; None unless every input got a well-formed result in order"""
+    import json
+    try:
+        results = json.loads(response).get("results")
+    except (json.JSONDecodeError, AttributeError):
+        return None
+    if not isinstance(results, list) or len(results) != count:
+        return None
+    
+    required = _BATCH_REQUIRED_KEYS[kind]
+    for i, result in enumerate(results):
+        if not isinstance(result, dict) or result.pop("index", None) != i:
+            return None
+        if not all(isinstance(result.get(key), str) for key in required):
+            return None
+        if not isinstance(result.get("entities", {}), dict):
+            return None
+    return results
+
 # Initialize Groq client
 client: Groq = None
 
@@ -77,6 +155,7 @@ class LLMService:
             return None
     
     @staticmethod
+    @semantic_cached("language", cacheable=lambda r: r != DEFAULT_LANGUAGE_RESULT)
     def detect_language(text: str) -> Dict[str, Any]:
         """
         Detect language of input text
@@ -116,9 +195,17 @@ Use ISO 639-1 codes (en, es, fr, de, hi, zh, ar, etc.)"""
             except:
                 pass
         
-        return {"language_code": "en", "language_name": "English", "confidence": 0.5}
+        return dict(DEFAULT_LANGUAGE_RESULT)
     
     @staticmethod
+    @semantic_cached(
+        "mood",
+        scope=lambda text, conversation_history: [
+            (m.get("role"), m.get("content"))
+            for m in _earlier_messages(text, conversation_history or [])[-5:]
+        ],
+        cacheable=lambda r: r != DEFAULT_MOOD_RESULT
+    )
     def analyze_mood(text: str, conversation_history: List[Dict] = None) -> Dict[str, Any]:
         """
         Analyze mood/sentiment of user message
@@ -168,14 +255,17 @@ Respond with JSON:
             except:
                 pass
         
-        return {
-            "mood": "neutral",
-            "confidence": 0.5,
-            "indicators": [],
-            "suggested_tone": "professional"
-        }
+        return copy.deepcopy(DEFAULT_MOOD_RESULT)
     
     @staticmethod
+    @semantic_cached(
+        "intent",
+        scope=lambda text, available_intents, conversation_context: (
+            available_intents,
+            _earlier_summary(text, conversation_context)
+        ),
+        cacheable=lambda r: r != DEFAULT_INTENT_RESULT
+    )
     def classify_intent(text: str, available_intents: List[str] = None, conversation_context: str = None) -> Dict[str, Any]:
         """
         Classify user intent for routing to appropriate agent
@@ -255,12 +345,64 @@ Respond with JSON:
             except:
                 pass
         
-        return {
-            "intent": "general_question",
-            "confidence": 0.5,
-            "entities": {},
-            "target_agent": "orchestrator"
-        }
+        return copy.deepcopy(DEFAULT_INTENT_RESULT)
+    
+    @staticmethod
+    def analyze_batch(kind: str, items: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Run one analysis (language, mood or intent) over several inputs in a single request
+        
+        Args:
+            kind: "language", "mood" or "intent"
+            items: List of dicts with 'text' and optional 'context'
+        
+        Returns:
+            One result dict per item (same order), or None if the batch could not be
+            parsed or any result is missing its required keys (callers then fall
+            back to single calls)
+        """
+        task = BATCH_ANALYSIS_TASKS[kind]
+        numbered = "\n\n".join(
+            f"[{i}] Input: {item['text']}"
+            + (f"\n    Context: {item['context']}" if item.get("context") else "")
+            for i, item in enumerate(items)
+        )
+        
+        messages = [
+            {
+                "role": "system",
+                "content": f"""{task}
+
+You will receive {len(items)} numbered inputs. Analyze each one independently, using only its own context.
+
+Respond with JSON:
+{{
+    "results": [
+        {{"index": 0, ...one result object per input, in order...}}
+    ]
+}}"""
+            },
+            {
+                "role": "user",
+                "content": numbered
+            }
+        ]
+        
+        response = LLMService.chat(
+            messages=messages,
+            agent_type="orchestrator",
+            temperature=0.2,
+            max_tokens=150 * len(items),
+            json_mode=True
+        )
+        
+        if response:
+            results = _batch_results(kind, response, len(items))
+            if results is not None:
+                return results
+            logger.warning("Discarding malformed %s batch response", kind)
+        
+        return None
     
     @staticmethod
     def generate_response(
@@ -268,7 +410,8 @@ Respond with JSON:
         context: Dict,
         agent_type: str,
         system_prompt: str,
-        conversation_history: List[Dict] = None
+        conversation_history: List[Dict] = None,
+        additional_context: str = ""
     ) -> str:
         """
         Generate a contextual response for the user
@@ -279,11 +422,15 @@ Respond with JSON:
             agent_type: Which agent is responding
             system_prompt: Agent-specific system prompt
             conversation_history: Previous messages
+            additional_context: Turn-specific facts, sent as a separate system
+                message so system_prompt stays an identical prefix across calls
         
         Returns:
             Generated response text
         """
         messages = [{"role": "system", "content": system_prompt}]
+        if additional_context:
+            messages.append({"role": "system", "content": f"Additional Context:\n{additional_context}"})
         
         # Add conversation history
         if conversation_history:
@@ -0,0 +1,128 @@
+"""
+Product Vector Index for Agentic AI Retail System
+In-memory similarity search over the product catalog (name, category, description)
+"""
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import PRODUCT_INDEX_MAX_PRODUCTS, PRODUCT_INDEX_MIN_SCORE, PRODUCT_INDEX_REFRESH_SECONDS
+from services.semantic_cache import embed_text, normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+class ProductIndex:
+    """
+    Sparse-vector index over the catalog
+
+    Each product is embedded once when the index is built; a query is one
+    embedding plus a walk over the posting lists of its features, so only
+    products sharing a word or trigram with the query are scored.
+
+    The index is built at startup (bootstrap_agents) and rebuilt in a
+    background thread when it is older than PRODUCT_INDEX_REFRESH_SECONDS or
+    after invalidate(); searches never build inline and keep using the
+    previous index until the new one is ready. A build that gets no products
+    (e.g. the database is unreachable) is not kept, and is retried after
+    _RETRY_SECONDS.
+    """
+
+    _RETRY_SECONDS = 30
+
+    def __init__(self):
+        self._postings: Dict[str, List[Tuple[str, float]]] = {}
+        self._built_at: float = 0.0
+        self._retry_at: float = 0.0
+        self._stale = True
+        self._lock = threading.Lock()
+        self._building = False
+
+    @staticmethod
+    def _document(product: Dict) -> str:
+        return " ".join(
+            str(product.get(field) or "") for field in ("name", "category", "description")
+        )
+
+    def build(self):
+        """(Re)build the index from the product catalog"""
+        from services.database import DatabaseService
+
+        products = DatabaseService.get_all_products(limit=PRODUCT_INDEX_MAX_PRODUCTS)
+        if not products:
+            with self._lock:
+                self._retry_at = time.monotonic() + self._RETRY_SECONDS
+                self._building = False
+            logger.warning("Product index not built: no products returned")
+            return
+
+        # embed_text.__wrapped__ skips the memo cache, which is meant for
+        # per-turn queries, not thousands of one-off product documents
+        embed = embed_text.__wrapped__
+        postings: Dict[str, List[Tuple[str, float]]] = {}
+        for product in products:
+            product_id = str(product.get("id"))
+            for feature, weight in embed(normalize_text(self._document(product))).items():
+                postings.setdefault(feature, []).append((product_id, weight))
+
+        with self._lock:
+            self._postings = postings
+            self._built_at = time.monotonic()
+            self._stale = False
+            self._building = False
+
+        logger.info("Product index built with %d products", len(products))
+
+    def invalidate(self):
+        """Mark the index stale (e.g. after a catalog update)"""
+        self._stale = True
+
+    def _ensure_fresh(self):
+        """Start a background rebuild when the index is missing, stale or expired"""
+        now = time.monotonic()
+        expired = not self._built_at or now - self._built_at > PRODUCT_INDEX_REFRESH_SECONDS
+        with self._lock:
+            if not (self._stale or expired) or self._building or now < self._retry_at:
+                return
+            self._building = True
+        threading.Thread(target=self._rebuild_quietly, daemon=True).start()
+
+    def _rebuild_quietly(self):
+        try:
+            self.build()
+        except Exception as e:
+            logger.error("Product index rebuild failed: %s", e)
+            with self._lock:
+                self._retry_at = time.monotonic() + self._RETRY_SECONDS
+                self._building = False
+
+    def search(self, query: str, k: int = 5, min_score: Optional[float] = None) -> List[str]:
+        """
+        Return up to k product IDs most similar to query
+
+        Args:
+            query: Free text (product name or the user's whole message)
+            k: Maximum number of IDs
+            min_score: Minimum cosine similarity (default PRODUCT_INDEX_MIN_SCORE)
+
+        Matches are fuzzy, so callers use this as a fallback after an exact
+        lookup finds nothing. Returns [] until the first build has finished.
+        """
+        if min_score is None:
+            min_score = PRODUCT_INDEX_MIN_SCORE
+
+        self._ensure_fresh()
+        postings = self._postings
+
+        scores: Dict[str, float] = {}
+        for feature, weight in embed_text(normalize_text(query)).items():
+            for product_id, product_weight in postings.get(feature, ()):
+                scores[product_id] = scores.get(product_id, 0.0) + weight * product_weight
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [product_id for product_id, score in ranked[:k] if score >= min_score]
+
+
+# Global index instance
+product_index = ProductIndex()
@@ -0,0 +1,288 @@
+"""
+Semantic Response Cache for Agentic AI Retail System
+Lets repeated or near-repeated user phrasings skip the per-turn LLM analysis calls
+"""
+import copy
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from functools import lru_cache, wraps
+from inspect import signature
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import (
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_TTL_SECONDS,
+    SEMANTIC_CACHE_THRESHOLDS,
+)
+
+logger = logging.getLogger(__name__)
+
+_PUNCT_RE = re.compile(r"[^\w\s']+")
+_SPACE_RE = re.compile(r"\s+")
+
+# Sparse L2-normalised vector: feature -> weight
+Embedding = Dict[str, float]
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace"""
+    text = _PUNCT_RE.sub(" ", (text or "").lower())
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+@lru_cache(maxsize=1024)
+def embed_text(normalized: str) -> Embedding:
+    """
+    Cheap local embedding: word unigrams plus character trigrams
+
+    Memoized so the language, mood and intent lookups for one user turn
+    share a single embedding of the same input.
+    """
+    features = Counter(normalized.split())
+    padded = f" {normalized} "
+    features.update(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    norm = math.sqrt(sum(v * v for v in features.values())) or 1.0
+    return {k: v / norm for k, v in features.items()}
+
+
+def cosine_similarity(a: Embedding, b: Embedding) -> float:
+    """Cosine similarity of two normalised sparse vectors"""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(w * b.get(k, 0.0) for k, w in a.items())
+
+
+def digest(*parts: Any) -> str:
+    """Short stable digest used to scope cache entries (history, context, ...)"""
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass(slots=True)
+class _CacheEntry:
+    scope: str
+    embedding: Embedding
+    value: Any
+    expires_at: float
+
+
+class SemanticCache:
+    """
+    Two-tier LRU cache with per-entry TTL
+
+    Tiers:
+    1. Exact - sha1 of the normalised text (plus scope), O(1) lookup
+    2. Semantic - cosine similarity against entries sharing the same scope;
+       a score >= exact_threshold is treated as an exact repeat, otherwise
+       it must clear semantic_threshold to count as a hit. A threshold of
+       1.0 or more turns this tier off (exact repeats only)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        semantic_threshold: float,
+        exact_threshold: float = 0.995,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS
+    ):
+        self.name = name
+        self.semantic_threshold = semantic_threshold
+        self.exact_threshold = exact_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._scopes: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(normalized: str, scope: str) -> str:
+        return hashlib.sha1(f"{scope}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, text: str, scope: str = "") -> Optional[Any]:
+        """Return a cached value for text (or a close paraphrase) within scope"""
+        normalized = normalize_text(text)
+        key = self._key(normalized, scope)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry.value)
+
+            if self.semantic_threshold >= 1.0:
+                self.misses += 1
+                return None
+
+            # Semantic tier: nearest neighbour among live entries in this scope
+            embedding = embed_text(normalized)
+            best_key, best_score = None, 0.0
+            for candidate_key in self._scopes.get(scope, ()):
+                candidate = self._entries.get(candidate_key)
+                if not candidate or candidate.expires_at <= now:
+                    continue
+                score = cosine_similarity(embedding, candidate.embedding)
+                if score > best_score:
+                    best_key, best_score = candidate_key, score
+
+            if best_key and best_score >= self.semantic_threshold:
+                self._entries.move_to_end(best_key)
+                self.hits += 1
+                logger.debug(
+                    "%s cache %s hit (%.3f)",
+                    self.name,
+                    "exact" if best_score >= self.exact_threshold else "semantic",
+                    best_score
+                )
+                return copy.deepcopy(self._entries[best_key].value)
+
+            self.misses += 1
+            return None
+
+    def set(self, text: str, value: Any, scope: str = ""):
+        """Store a value for text within scope"""
+        normalized = normalize_text(text)
+        key = self._key(normalized, scope)
+
+        with self._lock:
+            if key not in self._entries:
+                self._scopes.setdefault(scope, []).append(key)
+            self._entries[key] = _CacheEntry(
+                scope=scope,
+                embedding=embed_text(normalized),
+                value=copy.deepcopy(value),
+                expires_at=time.monotonic() + self.ttl_seconds
+            )
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                scope_keys = self._scopes.get(evicted.scope)
+                if scope_keys:
+                    scope_keys.remove(evicted_key)
+                    if not scope_keys:
+                        del self._scopes[evicted.scope]
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+_caches: Dict[str, SemanticCache] = {}
+
+
+def get_semantic_cache(tier: str) -> SemanticCache:
+    """Get or create the cache for an analysis tier (language, mood, intent)"""
+    if tier not in _caches:
+        _caches[tier] = SemanticCache(
+            name=tier,
+            semantic_threshold=SEMANTIC_CACHE_THRESHOLDS.get(tier, 1.0)
+        )
+    return _caches[tier]
+
+
+def semantic_cached(
+    tier: str,
+    scope: Callable[..., Tuple] = None,
+    cacheable: Callable[[Any], bool] = None
+):
+    """
+    Cache an LLM analysis function on its first (text) argument
+
+    Args:
+        tier: Cache tier name; selects the similarity threshold
+        scope: Called with the text and the function's other arguments; entries
+            only match when the digest of its return value is identical (e.g.
+            history). It should leave out the turn being analysed, which
+            callers have usually appended to the history already.
+        cacheable: Predicate on the result; fallbacks should not be cached
+
+    Concurrent calls with identical arguments are single-flighted: the first
+    caller runs the LLM call and the others wait for and share its result.
+    """
+    def decorator(func: Callable) -> Callable:
+        cache = get_semantic_cache(tier)
+        sig = signature(func)
+        text_param = next(iter(sig.parameters))
+        inflight: Dict[Tuple[str, str], Future] = {}
+        inflight_lock = threading.Lock()
+
+        def _cache_key(args, kwargs) -> Tuple[str, str]:
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            text = arguments.pop(text_param) or ""
+            return text, digest(scope(text, **arguments)) if scope else ""
+
+        def lookup(*args, **kwargs) -> Optional[Any]:
+            """Cached result for these arguments, without calling the LLM"""
+            if not SEMANTIC_CACHE_ENABLED:
+                return None
+            return cache.get(*_cache_key(args, kwargs))
+
+        def store(result: Any, *args, **kwargs):
+            """Record a result computed elsewhere (e.g. in a batch)"""
+            if SEMANTIC_CACHE_ENABLED and (cacheable is None or cacheable(result)):
+                text, scope_key = _cache_key(args, kwargs)
+                cache.set(text, result, scope_key)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            text, scope_key = _cache_key(args, kwargs)
+            if SEMANTIC_CACHE_ENABLED:
+                cached = cache.get(text, scope_key)
+                if cached is not None:
+                    return cached
+
+            flight_key = (normalize_text(text), scope_key)
+            with inflight_lock:
+                flight = inflight.get(flight_key)
+                leader = flight is None
+                if leader:
+                    flight = inflight[flight_key] = Future()
+
+            if not leader:
+                return copy.deepcopy(flight.result())
+
+            try:
+                result = func(*args, **kwargs)
+                if SEMANTIC_CACHE_ENABLED and (cacheable is None or cacheable(result)):
+                    cache.set(text, result, scope_key)
+                flight.set_result(copy.deepcopy(result))
+                return result
+            except BaseException as e:
+                flight.set_exception(e)
+                raise
+            finally:
+                with inflight_lock:
+                    inflight.pop(flight_key, None)
+
+        wrapper.cache = cache
+        wrapper.lookup = lookup
+        wrapper.store = store
+        return wrapper
+
+    return decorator
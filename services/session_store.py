@@ -0,0 +1,89 @@
+"""
+Session Store for Agentic AI Retail System
+Bounded in-process store for API sessions with idle expiry
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+
+class SessionStore:
+    """
+    LRU-bounded session store whose entries expire after ttl_seconds idle
+
+    Behaves like the plain dict it replaces (`in`, `[]`, `get`, `len`), so
+    memory stays proportional to active users rather than to every session
+    ever created. Reads refresh a session's idle timer.
+
+    on_evict(session_id, session) is called for sessions dropped by the size
+    bound or idle expiry (not for explicit deletes), so owners can release
+    resources attached to them.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int,
+        ttl_seconds: float,
+        on_evict: Optional[Callable[[str, Any], None]] = None
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, session_id: str, default: Any = None) -> Optional[Dict]:
+        """Return the session (refreshing its idle timer), or default if missing/expired"""
+        item = self._data.get(session_id)
+        if item is None:
+            return default
+        last_seen, session = item
+        now = time.monotonic()
+        if now - last_seen > self.ttl_seconds:
+            del self._data[session_id]
+            self._evicted(session_id, session)
+            return default
+        self._data[session_id] = (now, session)
+        self._data.move_to_end(session_id)
+        return session
+
+    def __getitem__(self, session_id: str) -> Dict:
+        session = self.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        return session
+
+    def __setitem__(self, session_id: str, session: Dict):
+        self._data[session_id] = (time.monotonic(), session)
+        self._data.move_to_end(session_id)
+        self._evict()
+
+    def __delitem__(self, session_id: str):
+        del self._data[session_id]
+
+    def __contains__(self, session_id: object) -> bool:
+        return self.get(session_id) is not None
+
+    def __len__(self) -> int:
+        self._evict()
+        return len(self._data)
+
+    def __iter__(self) -> Iterator[str]:
+        self._evict()
+        return iter(list(self._data))
+
+    def _evict(self):
+        """Drop sessions past the size bound, then expired ones from the LRU end"""
+        while len(self._data) > self.max_sessions:
+            session_id, (_, session) = self._data.popitem(last=False)
+            self._evicted(session_id, session)
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._data:
+            last_seen, _ = next(iter(self._data.values()))
+            if last_seen > cutoff:
+                break
+            session_id, (_, session) = self._data.popitem(last=False)
+            self._evicted(session_id, session)
+
+    def _evicted(self, session_id: str, session: Any):
+        if self.on_evict is not None:
+            self.on_evict(session_id, session)
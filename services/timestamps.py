@@ -0,0 +1,19 @@
+"""
+Timestamp helpers for Agentic AI Retail System
+Shared by the database layer, the API and voice sessions
+"""
+import time
+from datetime import datetime
+from typing import Tuple
+
+# (epoch second, its ISO string) - activity timestamps only need 1s resolution
+_iso_cache: Tuple[int, str] = (0, "")
+
+
+def now_iso() -> str:
+    """Current UTC time as an ISO string, formatted at most once per second"""
+    global _iso_cache
+    second = int(time.time())
+    if second != _iso_cache[0]:
+        _iso_cache = (second, datetime.utcfromtimestamp(second).isoformat())
+    return _iso_cache[1]
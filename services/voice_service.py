@@ -8,8 +8,91 @@ import logging
 import base64
 from typing import Optional
 
+try:
+    import orjson
+    
+    def _dumps(payload: dict) -> str:
+        return orjson.dumps(payload).decode("utf-8")
+except ImportError:
+    _dumps = json.dumps
+
 logger = logging.getLogger(__name__)
 
+# Binary audio frames a slow client may have queued before new ones are dropped
+# (frames are 20-200 ms of PCM, so this is several seconds of speech)
+_MAX_QUEUED_AUDIO_FRAMES = 64
+
+
+class _Outbox:
+    """
+    Per-connection send queue drained by a single writer task
+    
+    Handlers enqueue frames without awaiting the socket: dicts go out as
+    JSON text frames, bytes as binary frames, in queue order. With batching
+    on, the writer sends the JSON frames queued since its last write as one
+    {"type": "batch", "items": [...]} frame; a lone frame is sent as is.
+    
+    JSON frames are always queued. Audio is dropped while a client that
+    can't keep up already has _MAX_QUEUED_AUDIO_FRAMES waiting, so a stalled
+    socket can't grow the queue without bound.
+    """
+    
+    _CLOSE = object()
+    
+    def __init__(self, websocket, batch: bool = False):
+        self._websocket = websocket
+        self._batch = batch
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._queued_audio = 0
+        self._dropped_audio = 0
+        self._writer = asyncio.create_task(self._run())
+    
+    def send(self, frame):
+        """Queue a frame (dict or raw bytes) for the writer"""
+        if isinstance(frame, bytes):
+            if self._queued_audio >= _MAX_QUEUED_AUDIO_FRAMES:
+                self._dropped_audio += 1
+                return
+            self._queued_audio += 1
+        self._queue.put_nowait(frame)
+    
+    async def _run(self):
+        carry = None
+        while True:
+            frame = carry if carry is not None else await self._queue.get()
+            carry = None
+            if frame is self._CLOSE:
+                return
+            if isinstance(frame, bytes):
+                self._queued_audio -= 1
+                await self._websocket.send_bytes(frame)
+                continue
+            
+            frames = [frame]
+            while self._batch:
+                try:
+                    queued = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if not isinstance(queued, dict):
+                    # Binary frame or close marker: send the batch first
+                    carry = queued
+                    break
+                frames.append(queued)
+            
+            payload = frames[0] if len(frames) == 1 else {"type": "batch", "items": frames}
+            await self._websocket.send_text(_dumps(payload))
+    
+    async def close(self):
+        """Flush queued frames and stop the writer"""
+        self._queue.put_nowait(self._CLOSE)
+        try:
+            await self._writer
+        except Exception as e:
+            logger.debug("Voice outbox writer stopped: %s", e)
+        if self._dropped_audio:
+            logger.info("Dropped %d audio frames for a slow voice client", self._dropped_audio)
+
 
 class VoiceWebSocketHandler:
     """
@@ -31,9 +114,17 @@ class VoiceWebSocketHandler:
         
         Protocol:
         - Client → Server: {"type": "text", "content": "user message"}
+        - Client → Server: {"type": "text", "content": "...", "stream": true}
+          (response text first, then one "audio_chunk" per sentence)
+        - Client → Server: {"type": "text", "content": "...", "stream": "binary"}
+          (response text, {"type": "audio_start", "content_type": "..."}, raw
+          audio as binary frames while Deepgram produces it, {"type": "audio_end"})
+        - Client → Server: {"type": "stop_speaking"} (cancel pending audio)
         - Client → Server: {"type": "audio", "data": "base64_audio", "mime_type": "audio/wav"}
         - Server → Client: {"type": "response", "text": "...", "audio": "base64_audio"}
         - Server → Client: {"type": "transcript", "text": "...", "is_final": true/false}
+        - Server → Client: {"type": "batch", "items": [...]} (only when the client
+          connects with ?batch=1: frames queued together arrive in one message)
         """
         from agents.voice_agent import get_voice_agent
         
@@ -50,23 +141,34 @@ class VoiceWebSocketHandler:
             session_id = session.session_id
         
         self.active_connections[session_id] = websocket
+        query_params = getattr(websocket, "query_params", None) or {}
+        outbox = _Outbox(websocket, batch=query_params.get("batch") in ("1", "true"))
+        
+        # Streamed reply audio is forwarded by a task so the loop below keeps
+        # reading: "stop_speaking" or a new utterance interrupts it (barge-in)
+        audio_task: Optional[asyncio.Task] = None
+        
+        def stop_audio():
+            voice_agent.cancel_speech(session_id)
+            if audio_task and not audio_task.done():
+                audio_task.cancel()
         
         try:
             # Send session info
-            await websocket.send_text(json.dumps({
+            outbox.send({
                 "type": "session_started",
                 "session_id": session_id,
                 "message": "Voice session connected"
-            }))
+            })
             
             # Generate and send welcome
             welcome = await voice_agent.generate_welcome(session_id)
-            await websocket.send_text(json.dumps({
+            outbox.send({
                 "type": "response",
                 "text": welcome.get("text", "Hello! How can I help you?"),
                 "audio": welcome.get("audio_base64"),
-                "content_type": welcome.get("content_type", "audio/wav")
-            }))
+                "content_type": welcome.get("content_type")
+            })
             
             # Handle messages
             async for message in websocket.iter_text():
@@ -74,24 +176,35 @@ class VoiceWebSocketHandler:
                     data = json.loads(message)
                     msg_type = data.get("type")
                     
+                    if msg_type in ("text", "audio", "end_session"):
+                        stop_audio()
+                    
                     if msg_type == "text":
                         # Client-side STT - process text directly
                         text = data.get("content", "")
-                        if text.strip():
+                        if text.strip() and data.get("stream") == "binary":
+                            audio_task = await self._stream_binary(outbox, voice_agent, session_id, text)
+                        elif text.strip() and data.get("stream"):
+                            events = voice_agent.process_text_stream(session_id, text)
+                            # The reply text is sent before the loop resumes;
+                            # its sentence audio follows from the task
+                            outbox.send(self._stream_event(await anext(events)))
+                            audio_task = asyncio.create_task(self._forward_audio(outbox, events))
+                        elif text.strip():
                             result = await voice_agent.process_text(
                                 session_id, 
                                 text,
                                 generate_audio=True
                             )
                             
-                            await websocket.send_text(json.dumps({
+                            outbox.send({
                                 "type": "response",
                                 "text": result.get("response_text", ""),
                                 "audio": result.get("response_audio_base64"),
-                                "content_type": result.get("audio_content_type", "audio/wav"),
+                                "content_type": result.get("audio_content_type"),
                                 "data": result.get("data", {}),
                                 "suggested_actions": result.get("suggested_actions", [])
-                            }))
+                            })
                     
                     elif msg_type == "audio":
                         # Server-side STT - process audio
@@ -108,21 +221,21 @@ class VoiceWebSocketHandler:
                             
                             # Send transcript first
                             if result.get("transcript"):
-                                await websocket.send_text(json.dumps({
+                                outbox.send({
                                     "type": "transcript",
                                     "text": result.get("transcript"),
                                     "is_final": True
-                                }))
+                                })
                             
                             # Then send response
-                            await websocket.send_text(json.dumps({
+                            outbox.send({
                                 "type": "response",
                                 "text": result.get("response_text", ""),
                                 "audio": result.get("response_audio_base64"),
-                                "content_type": result.get("audio_content_type", "audio/wav"),
+                                "content_type": result.get("audio_content_type"),
                                 "data": result.get("data", {}),
                                 "suggested_actions": result.get("suggested_actions", [])
-                            }))
+                            })
                     
                     elif msg_type == "end_session":
                         # End the session gracefully
@@ -132,38 +245,114 @@ class VoiceWebSocketHandler:
                             generate_audio=True
                         )
                         
-                        await websocket.send_text(json.dumps({
+                        outbox.send({
                             "type": "session_ended",
                             "text": farewell.get("response_text", "Goodbye!"),
                             "audio": farewell.get("response_audio_base64")
-                        }))
+                        })
                         break
                     
+                    elif msg_type == "stop_speaking":
+                        stop_audio()
+                    
                     elif msg_type == "ping":
-                        await websocket.send_text(json.dumps({"type": "pong"}))
+                        outbox.send({"type": "pong"})
                         
                 except json.JSONDecodeError:
-                    await websocket.send_text(json.dumps({
+                    outbox.send({
                         "type": "error",
                         "message": "Invalid JSON"
-                    }))
+                    })
                 except Exception as e:
                     logger.error(f"Message handling error: {e}")
-                    await websocket.send_text(json.dumps({
+                    outbox.send({
                         "type": "error",
                         "message": str(e)
-                    }))
+                    })
         
         except Exception as e:
             logger.error(f"WebSocket error: {e}")
         
         finally:
             # Cleanup
+            stop_audio()
+            await outbox.close()
             voice_agent.end_session(session_id)
             if session_id in self.active_connections:
                 del self.active_connections[session_id]
             logger.info(f"Voice WebSocket closed: {session_id}")
 
+    
+    @staticmethod
+    async def _stream_binary(
+        outbox: _Outbox,
+        voice_agent,
+        session_id: str,
+        text: str
+    ) -> Optional[asyncio.Task]:
+        """
+        Send the reply text, then start forwarding TTS audio bytes as they arrive
+        
+        Returns the audio task (None when there is no audio) so the caller
+        can cancel it on barge-in.
+        """
+        result = await voice_agent.process_text(session_id, text, generate_audio=False)
+        outbox.send({
+            "type": "response",
+            "text": result.get("response_text", ""),
+            "audio": None,
+            "streaming": True,
+            "data": result.get("data", {}),
+            "suggested_actions": result.get("suggested_actions", [])
+        })
+        if not result.get("success") or not voice_agent.deepgram:
+            return None
+        
+        async def forward():
+            outbox.send({"type": "audio_start", "content_type": voice_agent.deepgram.tts_content_type})
+            try:
+                async for chunk in voice_agent.speak_stream(session_id, result["response_text"]):
+                    outbox.send(chunk)
+            except Exception as e:
+                logger.error("Audio streaming error: %s", e)
+            finally:
+                # Sent on barge-in too, so the client stops waiting for audio
+                outbox.send({"type": "audio_end"})
+        
+        return asyncio.create_task(forward())
+    
+    @classmethod
+    async def _forward_audio(cls, outbox: _Outbox, events):
+        """Send the remaining (audio) events of a process_text_stream"""
+        try:
+            async for event in events:
+                outbox.send(cls._stream_event(event))
+        except Exception as e:
+            logger.error("Audio streaming error: %s", e)
+    
+    @staticmethod
+    def _stream_event(event: dict) -> dict:
+        """Map a VoiceAgent stream event onto the WebSocket protocol"""
+        if event["type"] == "response":
+            return {
+                "type": "response",
+                "text": event.get("response_text", ""),
+                "audio": None,
+                "streaming": True,
+                "data": event.get("data", {}),
+                "suggested_actions": event.get("suggested_actions", [])
+            }
+        if event["type"] == "audio":
+            return {
+                "type": "audio_chunk",
+                "index": event["index"],
+                "text": event["text"],
+                "audio": event.get("audio_base64"),
+                "content_type": event.get("content_type"),
+                "is_last": event["is_last"]
+            }
+        return {"type": "error", "message": event.get("error", "Processing failed")}
+
 
 # Global handler instance
 voice_websocket_handler = VoiceWebSocketHandler()
@@ -0,0 +1,21 @@
+"""
+Shared test fixtures for the Agentic AI Retail System
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.semantic_cache import _caches
+
+
+@pytest.fixture(autouse=True)
+def clear_semantic_caches():
+    """Each test starts with empty language/mood/intent caches"""
+    for cache in _caches.values():
+        cache.clear()
+    yield
+    for cache in _caches.values():
+        cache.clear()
@@ -0,0 +1,9 @@
+"""
+Tests for agent registration
+"""
+from agents import AgentRegistry, AgentType, orchestrator, payment_agent
+
+
+def test_lookup_registers_the_built_in_agents_without_bootstrap():
+    assert AgentRegistry.get(AgentType.PAYMENT) is payment_agent
+    assert AgentRegistry.get(AgentType.ORCHESTRATOR) is orchestrator
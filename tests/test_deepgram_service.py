@@ -0,0 +1,41 @@
+"""
+Tests for the persistent Deepgram TTS socket
+"""
+import asyncio
+
+from services.deepgram_service import DeepgramConfig, DeepgramStreamingTTS
+
+
+class _StalledSocket:
+    def __init__(self):
+        self.closed = False
+
+    async def send(self, message):
+        pass
+
+    async def recv(self):
+        await asyncio.Event().wait()
+
+    async def close(self):
+        self.closed = True
+
+
+def test_cancelled_synthesis_drops_the_socket():
+    async def scenario():
+        tts = DeepgramStreamingTTS(DeepgramConfig(api_key="test"))
+        socket = tts._ws = _StalledSocket()
+
+        task = asyncio.create_task(tts.synthesize("Hello there!"))
+        await asyncio.sleep(0)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+        return socket, tts._ws
+
+    socket, current = asyncio.run(scenario())
+
+    assert socket.closed
+    assert current is None
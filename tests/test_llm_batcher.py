@@ -0,0 +1,86 @@
+"""
+Tests for the LLM micro-batcher
+"""
+import asyncio
+import json
+
+from services.llm_batcher import MicroBatcher
+from services.llm_service import LLMService
+
+
+def test_concurrent_calls_are_coalesced_into_one_request(monkeypatch):
+    batches = []
+
+    def fake_analyze_batch(kind, items):
+        batches.append((kind, [item["text"] for item in items]))
+        return [{"language_code": item["text"][:2], "language_name": "x", "confidence": 0.9} for item in items]
+
+    monkeypatch.setattr(LLMService, "analyze_batch", staticmethod(fake_analyze_batch))
+
+    async def run():
+        batcher = MicroBatcher(max_batch_size=16, max_wait_ms=50)
+        return await asyncio.gather(
+            batcher.submit("language", "en: where are the shoes"),
+            batcher.submit("language", "es: dónde están los zapatos"),
+            batcher.submit("language", "en: where are the shoes"),
+            batcher.submit("language", "fr: où sont les chaussures"),
+        )
+
+    results = asyncio.run(run())
+
+    # One request; the duplicate input shares a slot
+    assert batches == [("language", [
+        "en: where are the shoes",
+        "es: dónde están los zapatos",
+        "fr: où sont les chaussures",
+    ])]
+    assert [r["language_code"] for r in results] == ["en", "es", "en", "fr"]
+
+
+def test_unsplittable_batch_falls_back_to_single_calls(monkeypatch):
+    single_calls = []
+
+    monkeypatch.setattr(LLMService, "analyze_batch", staticmethod(lambda kind, items: None))
+
+    def fake_chat(**kwargs):
+        single_calls.append(kwargs)
+        return '{"language_code": "de", "language_name": "German", "confidence": 0.9}'
+
+    monkeypatch.setattr(LLMService, "chat", staticmethod(fake_chat))
+
+    async def run():
+        batcher = MicroBatcher(max_batch_size=16, max_wait_ms=50)
+        return await asyncio.gather(
+            batcher.submit("language", "wo sind die schuhe"),
+            batcher.submit("language", "guten abend zusammen"),
+        )
+
+    results = asyncio.run(run())
+
+    assert len(single_calls) == 2
+    assert all(r["language_code"] == "de" for r in results)
+
+
+def _batch_reply(monkeypatch, results):
+    monkeypatch.setattr(LLMService, "chat", staticmethod(lambda **kwargs: json.dumps({"results": results})))
+    return LLMService.analyze_batch("intent", [{"text": "show me shoes"}, {"text": "checkout"}])
+
+
+def test_well_formed_batch_results_are_returned_in_order(monkeypatch):
+    results = _batch_reply(monkeypatch, [
+        {"index": 0, "intent": "search_product", "target_agent": "recommendation"},
+        {"index": 1, "intent": "checkout", "target_agent": "payment"},
+    ])
+
+    assert [r["intent"] for r in results] == ["search_product", "checkout"]
+
+
+def test_batch_results_missing_keys_or_out_of_order_are_rejected(monkeypatch):
+    assert _batch_reply(monkeypatch, [
+        {"index": 0, "intent": "search_product", "target_agent": "recommendation"},
+        {"index": 1, "target_agent": "payment"},
+    ]) is None
+    assert _batch_reply(monkeypatch, [
+        {"index": 1, "intent": "checkout", "target_agent": "payment"},
+        {"index": 0, "intent": "search_product", "target_agent": "recommendation"},
+    ]) is None
@@ -0,0 +1,78 @@
+"""
+Tests for orchestrator routing of greetings and confirmations
+"""
+import asyncio
+
+import pytest
+
+from agents.base_agent import AgentMessage, AgentResponse, AgentType, new_message_id
+from agents.orchestrator import OrchestratorAgent, _confirm_category
+
+
+@pytest.fixture
+def orchestrator():
+    return OrchestratorAgent()
+
+
+def test_greeting_takes_the_fast_path(orchestrator):
+    result = orchestrator._fast_path("hello!", {"language": "en"})
+
+    assert result is not None
+    _, _, intent = result
+    assert intent["intent"] == "greeting"
+
+
+@pytest.mark.parametrize("reply", ["yes", "ok", "sure please", "go ahead"])
+def test_bare_confirmation_goes_to_the_llm(orchestrator, reply):
+    assert orchestrator._fast_path(reply, {"language": "en"}) is None
+
+
+def test_add_to_cart_question_outranks_cart_keyword():
+    summary = "user: do you have the pro in stock\nassistant: Would you like me to add it to your cart?"
+
+    assert _confirm_category(summary) == "addcart"
+
+
+def test_checkout_question_confirms_checkout():
+    assert _confirm_category("assistant: Ready to proceed to checkout?") == "checkout"
+
+
+def test_checkout_question_outranks_a_stock_mention():
+    assert _confirm_category("assistant: It's in stock! Shall I proceed to checkout?") == "checkout"
+
+
+def test_confirmed_add_to_cart_is_not_routed_to_checkout(orchestrator, monkeypatch):
+    routed = {}
+
+    async def fake_mood(text, history=None):
+        return {"mood": "neutral", "confidence": 0.5, "suggested_tone": "professional"}
+
+    async def fake_intent(text, context_summary=None):
+        return {"intent": "confirm_action", "confidence": 0.9, "entities": {}, "target_agent": "orchestrator"}
+
+    async def fake_route(target_agent, intent, entities, user_message, context):
+        routed.update(target_agent=target_agent, intent=intent)
+        return AgentResponse(success=True, message="ok")
+
+    monkeypatch.setattr(orchestrator, "analyze_mood", fake_mood)
+    monkeypatch.setattr(orchestrator, "classify_intent", fake_intent)
+    monkeypatch.setattr(orchestrator, "route_to_agent", fake_route)
+
+    message = AgentMessage(
+        message_id=new_message_id(),
+        from_agent=AgentType.ORCHESTRATOR,
+        to_agent=AgentType.ORCHESTRATOR,
+        intent="user_input",
+        payload={"user_message": "yes"},
+        context={
+            "language": "en",
+            "conversation_history": [
+                {"role": "assistant", "content": "Would you like me to add it to your cart?"},
+                {"role": "user", "content": "yes"},
+            ],
+        }
+    )
+
+    asyncio.run(orchestrator.process(message))
+
+    assert routed == {"target_agent": "payment", "intent": "add_to_cart"}
@@ -0,0 +1,135 @@
+"""
+Tests for the semantic response cache
+"""
+from services.llm_service import LLMService
+from services.semantic_cache import SemanticCache, get_semantic_cache
+
+
+def _count_llm_calls(monkeypatch, response: str) -> list:
+    calls = []
+
+    def fake_chat(**kwargs):
+        calls.append(kwargs)
+        return response
+
+    monkeypatch.setattr(LLMService, "chat", staticmethod(fake_chat))
+    return calls
+
+
+def test_exact_repeat_hits_after_normalisation():
+    cache = SemanticCache("test", semantic_threshold=0.9)
+    cache.set("Show me running shoes", {"intent": "search_product"})
+
+    assert cache.get("show me   running shoes!") == {"intent": "search_product"}
+    assert cache.stats()["hits"] == 1
+
+
+def test_threshold_separates_rewording_from_different_question():
+    cache = SemanticCache("test", semantic_threshold=0.8)
+    cache.set("show me running shoes", "shoes")
+
+    assert cache.get("show me running shoes please") == "shoes"
+    assert cache.get("what is your return policy") is None
+
+
+def test_entries_only_match_within_their_scope():
+    cache = SemanticCache("test", semantic_threshold=0.8)
+    cache.set("yes please", "add", scope="after add-to-cart question")
+
+    assert cache.get("yes please", scope="after checkout question") is None
+    assert cache.get("yes please", scope="after add-to-cart question") == "add"
+
+
+def test_returned_values_are_copies():
+    cache = SemanticCache("test", semantic_threshold=0.8)
+    cache.set("hello", {"entities": {}})
+
+    cache.get("hello")["entities"]["product"] = "mutated"
+
+    assert cache.get("hello") == {"entities": {}}
+
+
+def test_language_tier_does_not_reuse_a_translation():
+    assert get_semantic_cache("language").semantic_threshold >= 0.9
+
+    cache = get_semantic_cache("language")
+    cache.set("price of iPhone 15", {"language_code": "en"})
+
+    assert cache.get("precio del iPhone 15") is None
+
+
+def test_intent_scope_ignores_the_turn_being_classified(monkeypatch):
+    calls = _count_llm_calls(
+        monkeypatch,
+        '{"intent": "search_product", "confidence": 0.9, "entities": {}, "target_agent": "recommendation"}'
+    )
+    earlier = "assistant: Hi! How can I help you today?"
+
+    # Callers append the current user turn to the summary before classifying
+    first = "show me running shoes"
+    LLMService.classify_intent(first, conversation_context=f"{earlier}\nuser: {first}")
+    second = "Show me running shoes!"
+    result = LLMService.classify_intent(second, conversation_context=f"{earlier}\nuser: {second}")
+
+    assert len(calls) == 1
+    assert result["intent"] == "search_product"
+
+
+def test_intent_scope_still_separates_different_conversations(monkeypatch):
+    calls = _count_llm_calls(
+        monkeypatch,
+        '{"intent": "confirm_action", "confidence": 0.9, "entities": {}, "target_agent": "orchestrator"}'
+    )
+
+    LLMService.classify_intent("yes", conversation_context="assistant: Add it to your cart?\nuser: yes")
+    LLMService.classify_intent("yes", conversation_context="assistant: Ready to check out?\nuser: yes")
+
+    assert len(calls) == 2
+
+
+def test_mood_scope_ignores_the_turn_being_analysed(monkeypatch):
+    calls = _count_llm_calls(
+        monkeypatch,
+        '{"mood": "neutral", "confidence": 0.7, "indicators": [], "suggested_tone": "professional"}'
+    )
+    earlier = [{"role": "assistant", "content": "Hi! How can I help you today?"}]
+
+    first = "I need a new laptop for work"
+    LLMService.analyze_mood(first, earlier + [{"role": "user", "content": first}])
+    second = "I need a new laptop for work."
+    LLMService.analyze_mood(second, earlier + [{"role": "user", "content": second}])
+
+    assert len(calls) == 1
+
+
+def test_intent_tier_does_not_reuse_entities_of_a_similar_request(monkeypatch):
+    calls = _count_llm_calls(
+        monkeypatch,
+        '{"intent": "search_product", "confidence": 0.9, "entities": {}, "target_agent": "recommendation"}'
+    )
+
+    LLMService.classify_intent("show me running shoes")
+    LLMService.classify_intent("show me running socks")
+
+    assert len(calls) == 2
+
+
+def test_mood_tier_does_not_match_across_a_negation(monkeypatch):
+    calls = _count_llm_calls(
+        monkeypatch,
+        '{"mood": "happy", "confidence": 0.8, "indicators": [], "suggested_tone": "friendly"}'
+    )
+
+    LLMService.analyze_mood("I am happy with this order")
+    LLMService.analyze_mood("I am not happy with this order")
+
+    assert len(calls) == 2
+
+
+def test_fallback_results_are_not_cached(monkeypatch):
+    calls = _count_llm_calls(monkeypatch, None)
+
+    LLMService.detect_language("bonjour tout le monde")
+    LLMService.detect_language("bonjour tout le monde")
+
+    assert len(calls) == 2
@@ -0,0 +1,52 @@
+"""
+Tests for the bounded session store
+"""
+import time
+
+from services.session_store import SessionStore
+
+
+def test_least_recently_used_session_is_evicted():
+    evicted = []
+    store = SessionStore(2, ttl_seconds=60, on_evict=lambda sid, session: evicted.append((sid, session)))
+
+    store["a"] = {"name": "a"}
+    store["b"] = {"name": "b"}
+    store.get("a")  # a is now the most recently used
+    store["c"] = {"name": "c"}
+
+    assert "b" not in store
+    assert "a" in store and "c" in store
+    assert evicted == [("b", {"name": "b"})]
+
+
+def test_idle_sessions_expire():
+    evicted = []
+    store = SessionStore(10, ttl_seconds=0.05, on_evict=lambda sid, session: evicted.append(sid))
+
+    store["a"] = {}
+    time.sleep(0.1)
+
+    assert store.get("a") is None
+    assert evicted == ["a"]
+    assert len(store) == 0
+
+
+def test_reads_refresh_the_idle_timer():
+    store = SessionStore(10, ttl_seconds=0.2)
+
+    store["a"] = {}
+    for _ in range(3):
+        time.sleep(0.1)
+        assert store.get("a") is not None
+
+
+def test_explicit_delete_does_not_call_on_evict():
+    evicted = []
+    store = SessionStore(10, ttl_seconds=60, on_evict=lambda sid, session: evicted.append(sid))
+
+    store["a"] = {}
+    del store["a"]
+
+    assert "a" not in store
+    assert evicted == []
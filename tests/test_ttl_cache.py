@@ -0,0 +1,44 @@
+"""
+Tests for the TTL + LRU read cache
+"""
+import time
+
+from services.ttl_cache import TTLCache
+
+
+def test_entries_expire():
+    cache = TTLCache(10, ttl_seconds=0.05)
+    cache.set("k", [1])
+
+    assert cache.get("k") == [1]
+    time.sleep(0.1)
+    assert cache.get("k") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_callers_get_private_copies():
+    cache = TTLCache(10, ttl_seconds=60)
+    cache.set("products", [{"id": 1}])
+
+    cache.get("products")[0]["recommendation_reason"] = "mutated"
+
+    assert cache.get("products") == [{"id": 1}]
+
+
+def test_stats_count_hits_and_misses():
+    cache = TTLCache(10, ttl_seconds=60)
+    cache.get("missing")
+    cache.set("k", 1)
+    cache.get("k")
+
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
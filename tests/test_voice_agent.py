@@ -0,0 +1,22 @@
+"""
+Tests for splitting replies into TTS chunks
+"""
+from agents.voice_agent import split_sentences
+
+
+def test_splits_on_sentence_ends_and_newlines():
+    assert split_sentences("Hello there! How can I help?\nWe have shoes.") == [
+        "Hello there!",
+        "How can I help?",
+        "We have shoes.",
+    ]
+
+
+def test_long_sentences_are_capped_at_max_words():
+    chunks = split_sentences(" ".join(["word"] * 7), max_words=3)
+
+    assert [len(chunk.split()) for chunk in chunks] == [3, 3, 1]
+
+
+def test_empty_text_has_no_chunks():
+    assert split_sentences("") == []
@@ -0,0 +1,42 @@
+"""
+Tests for the voice WebSocket send queue
+"""
+import asyncio
+
+from services import voice_service
+from services.voice_service import _Outbox
+
+
+class _SlowSocket:
+    def __init__(self):
+        self.sent = []
+        self.release = asyncio.Event()
+
+    async def send_bytes(self, frame):
+        await self.release.wait()
+        self.sent.append(frame)
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+
+def test_audio_is_dropped_while_a_slow_client_is_behind(monkeypatch):
+    monkeypatch.setattr(voice_service, "_MAX_QUEUED_AUDIO_FRAMES", 2)
+
+    async def scenario():
+        socket = _SlowSocket()
+        outbox = _Outbox(socket)
+        outbox.send(b"first")
+        await asyncio.sleep(0)  # writer picks up the first frame and stalls
+
+        for i in range(5):
+            outbox.send(bytes([i]))
+        outbox.send({"type": "done"})
+
+        socket.release.set()
+        await outbox.close()
+        return socket.sent
+
+    sent = asyncio.run(scenario())
+
+    assert sent == [b"first", b"\x00", b"\x01", '{"type":"done"}']